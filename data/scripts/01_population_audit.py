@@ -20,15 +20,6 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def detect_imputation_source(df):
@@ -142,4 +133,13 @@ def main():
     logger.info("\nPopulation imputation audit complete (descriptive only)")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
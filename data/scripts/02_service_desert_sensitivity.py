@@ -5,7 +5,7 @@ Purpose: Recompute service desert counts using thresholds 40%, 50%, 60% of distr
          baseline. The 50% threshold is the PRIMARY operational definition; 40% and 60%
          are treated strictly as robustness checks.
 
-Output: service_desert_sensitivity.csv
+Output: service_desert_sensitivity.csv (+ .parquet sibling for downstream reads)
 """
 
 import pandas as pd
@@ -13,6 +13,8 @@ import numpy as np
 from pathlib import Path
 import logging
 
+from pincode_cache import load_pincode_agg
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
@@ -20,15 +22,6 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def compute_service_deserts(pincode_agg, district_agg, threshold_pct):
@@ -39,6 +32,9 @@ def compute_service_deserts(pincode_agg, district_agg, threshold_pct):
     - Rural area
     - activity_per_100k < (threshold_pct / 100) * district_activity_per_100k
     - population >= district median population
+    
+    Expects pincode_agg to already carry district_median_pop (computed once
+    in main and reused across thresholds).
     """
     # Merge district baseline
     pincode_with_baseline = pincode_agg.merge(
@@ -52,25 +48,21 @@ def compute_service_deserts(pincode_agg, district_agg, threshold_pct):
         how='left'
     )
     
-    # Compute district median population
-    district_pop_median = pincode_agg.groupby('district')['population'].median()
-    pincode_with_baseline['district_median_pop'] = pincode_with_baseline['district'].map(district_pop_median)
-    
-    # Apply threshold
+    # Apply threshold (single fused expression; numexpr-backed when installed)
     threshold_decimal = threshold_pct / 100.0
-    is_desert = (
-        (pincode_with_baseline['urban_flag'] == 'rural') &
-        (pincode_with_baseline['activity_per_100k'] < threshold_decimal * pincode_with_baseline['district_activity_per_100k']) &
-        (pincode_with_baseline['population'] >= pincode_with_baseline['district_median_pop'])
+    is_rural = (pincode_with_baseline['urban_flag'] == 'rural').to_numpy()
+    is_desert = pincode_with_baseline.eval(
+        "@is_rural"
+        " & (activity_per_100k < @threshold_decimal * district_activity_per_100k)"
+        " & (population >= district_median_pop)"
     )
     
     desert_count = is_desert.sum()
     
     # Compute relative gap for deserts
     desert_pincodes = pincode_with_baseline[is_desert]
-    mean_gap_pct = (
-        (desert_pincodes['activity_per_100k'] - desert_pincodes['district_activity_per_100k']) /
-        desert_pincodes['district_activity_per_100k'] * 100
+    mean_gap_pct = desert_pincodes.eval(
+        "(activity_per_100k - district_activity_per_100k) / district_activity_per_100k * 100"
     ).mean() if desert_count > 0 else np.nan
     
     # Get affected pincode list
@@ -90,70 +82,11 @@ def main():
     logger.info("Primary threshold: 50% (operational definition)")
     logger.info("Robustness checks: 40%, 60%")
     
-    # Load data
-    logger.info(f"Loading data from {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Standardize columns
-    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-    
-    # Get population column
-    pop_col = None
-    for c in ['total_population', 'population']:
-        if c in df.columns:
-            pop_col = c
-            break
-    
-    if not pop_col:
-        male_col = next((c for c in ['male_population'] if c in df.columns), None)
-        female_col = next((c for c in ['female_population'] if c in df.columns), None)
-        if male_col and female_col:
-            df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-            pop_col = 'population'
-    
-    df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-    
-    # Ensure pincode is string
-    if 'pincode' in df.columns:
-        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-    
-    # Get urban flag
-    if 'urban_flag' not in df.columns:
-        if 'urban_share' in df.columns:
-            urban_share = pd.to_numeric(df['urban_share'], errors='coerce')
-            df['urban_flag'] = 'unknown'
-            df.loc[urban_share >= 0.5, 'urban_flag'] = 'urban'
-            df.loc[urban_share < 0.5, 'urban_flag'] = 'rural'
-        else:
-            df['urban_flag'] = 'unknown'
-    
-    # Get activity counts
-    for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-        if c not in df.columns:
-            df[c] = 0
-        else:
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-    
-    df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-    
-    # Aggregate to pincode level
-    logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=(pop_col, 'sum'),
-        urban_flag=('urban_flag', 'first'),
-        total_activity=('total_activity', 'sum')
-    )
-    
-    # Handle zero/negative population
-    pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-    global_median = pincode_agg['population'].median()
-    pincode_agg['population'].fillna(global_median, inplace=True)
+    # Load pincode aggregate (Parquet cache, rebuilt from INPUT_CSV when stale)
+    pincode_agg = load_pincode_agg(INPUT_CSV)
     
-    # Compute activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    # District median population (broadcast per pincode, shared by all thresholds)
+    pincode_agg['district_median_pop'] = pincode_agg.groupby('district', sort=False)['population'].transform('median')
     
     # District aggregates
     logger.info("Computing district baselines")
@@ -162,7 +95,7 @@ def main():
         population=('population', 'sum'),
         total_activity=('total_activity', 'sum')
     )
-    district_agg['activity_per_100k'] = district_agg['total_activity'] / (district_agg['population'] / 100000)
+    district_agg.eval('activity_per_100k = total_activity / (population / 100000)', inplace=True)
     
     # Test thresholds
     thresholds = [40, 50, 60]
@@ -188,6 +121,7 @@ def main():
     # Save
     output_path = OUT_DIR / "service_desert_sensitivity.csv"
     sensitivity_summary.to_csv(output_path, index=False)
+    sensitivity_summary.to_parquet(output_path.with_suffix('.parquet'), compression='zstd', index=False)
     logger.info(f"\nSaved sensitivity analysis to {output_path}")
     
     # Summary
@@ -208,4 +142,13 @@ def main():
     logger.info("\nService desert sensitivity analysis complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
@@ -8,7 +8,7 @@ Purpose: Validate rural-urban activity disparity using:
          - Export median values for citation in final report
 
 Output: rural_urban_comparison_stats.json, rural_urban_boxplot.png, 
-        rural_urban_medians.csv
+        rural_urban_medians.csv (+ .parquet sibling for downstream reads)
 """
 
 import pandas as pd
@@ -19,6 +19,8 @@ import json
 from scipy import stats
 import matplotlib.pyplot as plt
 
+from pincode_cache import load_pincode_agg
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
@@ -26,15 +28,6 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def cohens_d(group1, group2):
@@ -67,70 +60,8 @@ def main():
     logger.info("RURAL VS URBAN STATISTICAL VALIDATION")
     logger.info("=" * 60)
     
-    # Load data
-    logger.info(f"Loading data from {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Standardize columns
-    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-    
-    # Get population
-    pop_col = None
-    for c in ['total_population', 'population']:
-        if c in df.columns:
-            pop_col = c
-            break
-    
-    if not pop_col:
-        male_col = next((c for c in ['male_population'] if c in df.columns), None)
-        female_col = next((c for c in ['female_population'] if c in df.columns), None)
-        if male_col and female_col:
-            df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-            pop_col = 'population'
-    
-    df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-    
-    # Ensure pincode
-    if 'pincode' in df.columns:
-        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-    
-    # Urban flag
-    if 'urban_flag' not in df.columns:
-        if 'urban_share' in df.columns:
-            urban_share = pd.to_numeric(df['urban_share'], errors='coerce')
-            df['urban_flag'] = 'unknown'
-            df.loc[urban_share >= 0.5, 'urban_flag'] = 'urban'
-            df.loc[urban_share < 0.5, 'urban_flag'] = 'rural'
-        else:
-            df['urban_flag'] = 'unknown'
-    
-    # Activity counts
-    for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-        if c not in df.columns:
-            df[c] = 0
-        else:
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-    
-    df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-    
-    # Aggregate to pincode
-    logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=(pop_col, 'sum'),
-        urban_flag=('urban_flag', 'first'),
-        total_activity=('total_activity', 'sum')
-    )
-    
-    # Fix population
-    pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-    global_median = pincode_agg['population'].median()
-    pincode_agg['population'].fillna(global_median, inplace=True)
-    
-    # Activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    # Load pincode aggregate (Parquet cache, rebuilt from INPUT_CSV when stale)
+    pincode_agg = load_pincode_agg(INPUT_CSV)
     
     # Split by urban/rural
     rural = pincode_agg[pincode_agg['urban_flag'] == 'rural']['activity_per_100k'].values
@@ -149,9 +80,9 @@ def main():
     logger.info("Computing bootstrap 95% CI for median difference")
     ci_lower, ci_upper = bootstrap_ci(rural, urban, n_boot=10000, ci=95)
     
-    # Medians for citation
-    rural_median = np.median(rural)
-    urban_median = np.median(urban)
+    # Quartiles and medians (for citation) in one quantile pass per group
+    rural_q25, rural_median, rural_q75 = np.quantile(rural, [0.25, 0.5, 0.75])
+    urban_q25, urban_median, urban_q75 = np.quantile(urban, [0.25, 0.5, 0.75])
     median_diff = rural_median - urban_median
     
     # Summary stats
@@ -167,16 +98,16 @@ def main():
             "mean": float(rural_mean),
             "median": float(rural_median),
             "std": float(rural_std),
-            "q25": float(np.percentile(rural, 25)),
-            "q75": float(np.percentile(rural, 75))
+            "q25": float(rural_q25),
+            "q75": float(rural_q75)
         },
         "urban": {
             "n": int(len(urban)),
             "mean": float(urban_mean),
             "median": float(urban_median),
             "std": float(urban_std),
-            "q25": float(np.percentile(urban, 25)),
-            "q75": float(np.percentile(urban, 75))
+            "q25": float(urban_q25),
+            "q75": float(urban_q75)
         },
         "effect_size_cohens_d": float(effect_size),
         "mann_whitney_u_statistic": float(u_stat),
@@ -200,6 +131,7 @@ def main():
     ])
     medians_path = OUT_DIR / "rural_urban_medians.csv"
     medians_df.to_csv(medians_path, index=False)
+    medians_df.to_parquet(medians_path.with_suffix('.parquet'), compression='zstd', index=False)
     logger.info(f"Saved medians CSV to {medians_path}")
     
     # Create boxplot
@@ -236,4 +168,13 @@ def main():
     logger.info("\nRural vs urban statistical validation complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
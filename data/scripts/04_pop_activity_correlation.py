@@ -11,7 +11,6 @@ Purpose: Analyze relationship between population and activity using:
 Output: pop_activity_stats.json, pop_activity_scatter.png, regression_diagnostics.png
 """
 
-import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
@@ -22,6 +21,8 @@ from statsmodels.nonparametric.smoothers_lowess import lowess
 from statsmodels.robust.robust_linear_model import RLM
 import statsmodels.api as sm
 
+from pincode_cache import load_pincode_agg
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
@@ -29,15 +30,6 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -47,59 +39,8 @@ def main():
     logger.info("WARNING: Correlation does NOT imply service adequacy or equity")
     logger.info("Emphasis on heteroskedasticity and descriptive interpretation only")
     
-    # Load data
-    logger.info(f"\nLoading data from {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Standardize columns
-    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-    
-    # Get population
-    pop_col = None
-    for c in ['total_population', 'population']:
-        if c in df.columns:
-            pop_col = c
-            break
-    
-    if not pop_col:
-        male_col = next((c for c in ['male_population'] if c in df.columns), None)
-        female_col = next((c for c in ['female_population'] if c in df.columns), None)
-        if male_col and female_col:
-            df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-            pop_col = 'population'
-    
-    df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-    
-    # Ensure pincode
-    if 'pincode' in df.columns:
-        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-    
-    # Activity counts
-    for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-        if c not in df.columns:
-            df[c] = 0
-        else:
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-    
-    df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-    
-    # Aggregate to pincode
-    logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=(pop_col, 'sum'),
-        total_activity=('total_activity', 'sum')
-    )
-    
-    # Fix population
-    pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-    global_median = pincode_agg['population'].median()
-    pincode_agg['population'].fillna(global_median, inplace=True)
-    
-    # Activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    # Load pincode aggregate (Parquet cache, rebuilt from INPUT_CSV when stale)
+    pincode_agg = load_pincode_agg(INPUT_CSV)
     
     # Remove any infinite or NaN values
     analysis_df = pincode_agg[
@@ -255,4 +196,13 @@ def main():
     logger.info("\nPopulation-activity correlation analysis complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
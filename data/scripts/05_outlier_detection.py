@@ -15,6 +15,9 @@ import numpy as np
 from pathlib import Path
 import logging
 
+from _common import top_k
+from pincode_cache import load_pincode_agg
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
@@ -22,71 +25,68 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def iqr_outliers(series, multiplier=1.5):
-    """Detect outliers using IQR method."""
-    q1 = series.quantile(0.25)
-    q3 = series.quantile(0.75)
+def robust_outliers(values, iqr_multiplier=1.5, mad_multiplier=3):
+    """
+    Detect outliers using both the IQR and Median Absolute Deviation methods.
+    
+    Q1, median and Q3 come from a single np.quantile call; the median is
+    reused for MAD. Returns the combined flag (OR logic - flagged by either
+    method) as a boolean ndarray from one fused pass over values.
+    """
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    
+    # The deviations are a scratch array, so let median partition it in place
+    mad = np.median(np.abs(values - median), overwrite_input=True)
+    
+    # IQR bounds
     iqr = q3 - q1
-    lower_bound = q1 - multiplier * iqr
-    upper_bound = q3 + multiplier * iqr
-    return (series < lower_bound) | (series > upper_bound)
-
-def mad_outliers(series, multiplier=3):
-    """Detect outliers using Median Absolute Deviation."""
-    median = series.median()
-    mad = np.median(np.abs(series - median))
+    iqr_lower, iqr_upper = q1 - iqr_multiplier * iqr, q3 + iqr_multiplier * iqr
+    
+    # MAD bounds (a zero MAD flags nothing, so open the bounds fully)
     if mad == 0:
-        return pd.Series([False] * len(series), index=series.index)
-    lower_bound = median - multiplier * mad
-    upper_bound = median + multiplier * mad
-    return (series < lower_bound) | (series > upper_bound)
+        mad_lower, mad_upper = -np.inf, np.inf
+    else:
+        mad_lower, mad_upper = median - mad_multiplier * mad, median + mad_multiplier * mad
+    
+    # Single fused expression; numexpr-backed when installed
+    return pd.eval(
+        "(values < iqr_lower) | (values > iqr_upper) | (values < mad_lower) | (values > mad_upper)"
+    )
 
-def assign_reason_code(row, global_median_activity, district_baseline):
+def reason_flags(outliers):
     """
-    Assign reason codes based on multiple factors.
+    Boolean frame with one column per reason code (vectorized over all outliers).
     Priority order:
     1. Population imputation + extreme activity
     2. Very low activity (< 10% of district baseline)
     3. Very high activity (> 500% of district baseline)
     4. Geographic isolation (if applicable)
     """
-    reasons = []
-    
-    # Check for extreme low activity
-    if 'district_activity_per_100k' in row.index:
-        district_baseline_val = row['district_activity_per_100k']
-        if row['activity_per_100k'] < 0.1 * district_baseline_val:
-            reasons.append("Sub-threshold activity (<10% of district)")
+    activity = outliers['activity_per_100k'].to_numpy()
+    district_baseline = outliers['district_activity_per_100k'].to_numpy()
     
-    # Check for extreme high activity
-    if 'district_activity_per_100k' in row.index:
-        if row['activity_per_100k'] > 5.0 * row['district_activity_per_100k']:
-            reasons.append("Extreme high activity (>500% of district)")
-    
-    # Check for low absolute activity
-    if row['total_activity'] < 50:
-        reasons.append("Very low absolute activity (<50 records)")
-    
-    # Check for population concerns
-    if row['population'] < 500:
-        reasons.append("Very small population (<500)")
+    flags = pd.DataFrame({
+        "Sub-threshold activity (<10% of district)": activity < 0.1 * district_baseline,
+        "Extreme high activity (>500% of district)": activity > 5.0 * district_baseline,
+        "Very low absolute activity (<50 records)": outliers['total_activity'].to_numpy() < 50,
+        "Very small population (<500)": outliers['population'].to_numpy() < 500,
+    }, index=outliers.index)
     
     # Default
-    if not reasons:
-        reasons.append("Statistical outlier (IQR/MAD)")
+    flags["Statistical outlier (IQR/MAD)"] = ~flags.any(axis=1)
     
-    return "; ".join(reasons)
+    return flags
+
+def assign_reason_codes(flags):
+    """Join each row's flagged reasons with '; '."""
+    # Concatenate "<reason>; " per flag, then drop the trailing separator
+    reasons = sum(
+        (np.where(flags[reason], reason + "; ", "").astype(object) for reason in flags.columns),
+        np.full(len(flags), "", dtype=object)
+    )
+    return pd.Series(reasons, index=flags.index).str[:-2]
 
 def main():
     logger.info("=" * 60)
@@ -95,95 +95,33 @@ def main():
     logger.info("Detecting extreme activity_per_100k using IQR and MAD methods")
     logger.info("Output capped to top 100 most policy-relevant cases")
     
-    # Load data
-    logger.info(f"\nLoading data from {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Standardize columns
-    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-    
-    # Get population
-    pop_col = None
-    for c in ['total_population', 'population']:
-        if c in df.columns:
-            pop_col = c
-            break
-    
-    if not pop_col:
-        male_col = next((c for c in ['male_population'] if c in df.columns), None)
-        female_col = next((c for c in ['female_population'] if c in df.columns), None)
-        if male_col and female_col:
-            df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-            pop_col = 'population'
-    
-    df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-    
-    # Ensure pincode
-    if 'pincode' in df.columns:
-        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-    
-    # Activity counts
-    for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-        if c not in df.columns:
-            df[c] = 0
-        else:
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-    
-    df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-    
-    # Aggregate to pincode
-    logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=(pop_col, 'sum'),
-        total_activity=('total_activity', 'sum')
-    )
-    
-    # Fix population
-    pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-    global_median = pincode_agg['population'].median()
-    pincode_agg['population'].fillna(global_median, inplace=True)
-    
-    # Activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    # Load pincode aggregate (Parquet cache, rebuilt from INPUT_CSV when stale)
+    pincode_agg = load_pincode_agg(INPUT_CSV)
     
     # Get district baselines
     district_agg = pincode_agg.groupby('district', as_index=False).agg(
         population=('population', 'sum'),
         total_activity=('total_activity', 'sum')
     )
-    district_agg['district_activity_per_100k'] = district_agg['total_activity'] / (district_agg['population'] / 100000)
+    district_agg.eval('district_activity_per_100k = total_activity / (population / 100000)', inplace=True)
     
-    # Merge district baseline
-    pincode_agg = pincode_agg.merge(
-        district_agg[['district', 'district_activity_per_100k']],
-        on='district',
-        how='left'
-    )
+    # Attach district baseline (indexed lookup instead of a merge)
+    baseline_map = district_agg.set_index('district')['district_activity_per_100k']
+    pincode_agg['district_activity_per_100k'] = pincode_agg['district'].map(baseline_map)
     
     # Detect outliers
-    logger.info("\nDetecting outliers using IQR method")
-    iqr_flags = iqr_outliers(pincode_agg['activity_per_100k'], multiplier=1.5)
-    
-    logger.info("Detecting outliers using MAD method")
-    mad_flags = mad_outliers(pincode_agg['activity_per_100k'], multiplier=3)
-    
-    # Combine flags (OR logic - flagged by either method)
-    pincode_agg['outlier_flag'] = iqr_flags | mad_flags
+    logger.info("\nDetecting outliers using IQR and MAD methods")
+    pincode_agg['outlier_flag'] = robust_outliers(
+        pincode_agg['activity_per_100k'].to_numpy(), iqr_multiplier=1.5, mad_multiplier=3
+    )
     
     logger.info(f"Outliers detected: {pincode_agg['outlier_flag'].sum():,} ({100 * pincode_agg['outlier_flag'].mean():.2f}%)")
     
     # Assign reason codes to outliers
     logger.info("\nAssigning reason codes to outliers")
-    global_median_activity = pincode_agg['activity_per_100k'].median()
-    
     outliers = pincode_agg[pincode_agg['outlier_flag']].copy()
-    outliers['reason_code'] = outliers.apply(
-        lambda row: assign_reason_code(row, global_median_activity, pincode_agg),
-        axis=1
-    )
+    flags = reason_flags(outliers)
+    outliers['reason_code'] = assign_reason_codes(flags)
     
     # Compute policy relevance score
     # Higher score = more policy-relevant
@@ -195,8 +133,7 @@ def main():
     )
     
     # Sort by policy relevance and take top 100
-    outliers_sorted = outliers.sort_values('policy_relevance_score', ascending=False)
-    top_100 = outliers_sorted.head(100)
+    top_100 = top_k(outliers, 'policy_relevance_score', 100)
     
     # Prepare output
     anomaly_output = top_100[[
@@ -218,22 +155,32 @@ def main():
     logger.info(f"Top 100 most policy-relevant anomalies exported")
     logger.info(f"\nReason code distribution (top 100):")
     
-    # Count reason codes (they can overlap)
-    reason_counts = {}
-    for reasons in top_100['reason_code']:
-        for reason in reasons.split('; '):
-            reason_counts[reason] = reason_counts.get(reason, 0) + 1
+    # Count reason codes (they can overlap) with one column sum over the flags
+    reason_counts = flags.loc[top_100.index].sum()
+    reason_counts = reason_counts[reason_counts > 0].sort_values(ascending=False, kind='stable')
     
-    for reason, count in sorted(reason_counts.items(), key=lambda x: x[1], reverse=True):
-        logger.info(f"  {reason}: {count}")
+    logger.info("\n".join("  " + reason_counts.index + ": " + reason_counts.astype(str)))
     
-    logger.info(f"\nTop 5 most policy-relevant anomalies:")
-    for idx, row in top_100.head(5).iterrows():
-        logger.info(f"  {row['pincode']} ({row['district']}, {row['state']})")
-        logger.info(f"    Activity: {row['activity_per_100k']:.1f} per 100k (district avg: {row['district_activity_per_100k']:.1f})")
-        logger.info(f"    Reason: {row['reason_code']}")
+    # Build the top-5 block column-wise and emit it as one record
+    top_5 = top_100.head(5)
+    top_5_lines = (
+        "  " + top_5['pincode'].astype(str) + " (" + top_5['district'].astype(str) + ", " + top_5['state'].astype(str) + ")"
+        + "\n    Activity: " + top_5['activity_per_100k'].map("{:.1f}".format)
+        + " per 100k (district avg: " + top_5['district_activity_per_100k'].map("{:.1f}".format) + ")"
+        + "\n    Reason: " + top_5['reason_code']
+    )
+    logger.info(f"\nTop 5 most policy-relevant anomalies:\n" + "\n".join(top_5_lines))
     
     logger.info("\nOutlier and anomaly detection complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
@@ -8,12 +8,13 @@ Purpose: Re-aggregate service deserts by district and verify top 15 districts
 Output: district_deserts_top15.csv, district_desert_counts.png
 """
 
-import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
 import matplotlib.pyplot as plt
 
+from pincode_cache import load_pincode_agg
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
@@ -21,15 +22,6 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -38,70 +30,8 @@ def main():
     logger.info("=" * 60)
     logger.info("Verifying top 15 districts by service desert concentration")
     
-    # Load data
-    logger.info(f"\nLoading data from {INPUT_CSV}")
-    df = pd.read_csv(INPUT_CSV, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Standardize columns
-    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-    
-    # Get population
-    pop_col = None
-    for c in ['total_population', 'population']:
-        if c in df.columns:
-            pop_col = c
-            break
-    
-    if not pop_col:
-        male_col = next((c for c in ['male_population'] if c in df.columns), None)
-        female_col = next((c for c in ['female_population'] if c in df.columns), None)
-        if male_col and female_col:
-            df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-            pop_col = 'population'
-    
-    df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-    
-    # Ensure pincode
-    if 'pincode' in df.columns:
-        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-    
-    # Urban flag
-    if 'urban_flag' not in df.columns:
-        if 'urban_share' in df.columns:
-            urban_share = pd.to_numeric(df['urban_share'], errors='coerce')
-            df['urban_flag'] = 'unknown'
-            df.loc[urban_share >= 0.5, 'urban_flag'] = 'urban'
-            df.loc[urban_share < 0.5, 'urban_flag'] = 'rural'
-        else:
-            df['urban_flag'] = 'unknown'
-    
-    # Activity counts
-    for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-        if c not in df.columns:
-            df[c] = 0
-        else:
-            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-    
-    df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-    
-    # Aggregate to pincode
-    logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=(pop_col, 'sum'),
-        urban_flag=('urban_flag', 'first'),
-        total_activity=('total_activity', 'sum')
-    )
-    
-    # Fix population
-    pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-    global_median = pincode_agg['population'].median()
-    pincode_agg['population'].fillna(global_median, inplace=True)
-    
-    # Activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    # Load pincode aggregate (Parquet cache, rebuilt from INPUT_CSV when stale)
+    pincode_agg = load_pincode_agg(INPUT_CSV)
     
     # District aggregates
     logger.info("Computing district baselines")
@@ -110,15 +40,12 @@ def main():
         population=('population', 'sum'),
         total_activity=('total_activity', 'sum')
     )
-    district_agg['activity_per_100k'] = district_agg['total_activity'] / (district_agg['population'] / 100000)
-    
-    # Merge district baseline
-    pincode_with_baseline = pincode_agg.merge(
-        district_agg[['district', 'activity_per_100k']].rename(
-            columns={'activity_per_100k': 'district_activity_per_100k'}
-        ),
-        on='district',
-        how='left'
+    district_agg.eval('activity_per_100k = total_activity / (population / 100000)', inplace=True)
+    
+    # Attach district baseline (indexed lookup instead of a merge)
+    baseline_map = district_agg.set_index('district')['activity_per_100k']
+    pincode_with_baseline = pincode_agg.assign(
+        district_activity_per_100k=pincode_agg['district'].map(baseline_map)
     )
     
     # Compute district median population
@@ -133,21 +60,29 @@ def main():
         (pincode_with_baseline['population'] >= pincode_with_baseline['district_median_pop'])
     )
     
-    pincode_with_baseline['is_service_desert'] = is_desert
+    pincode_with_baseline['is_service_desert'] = is_desert.to_numpy().astype(np.int8)
     
     logger.info(f"Total service deserts identified: {is_desert.sum():,}")
     
+    # Precompute per-pincode columns so every district aggregate is a plain sum
+    pincode_with_baseline['is_rural'] = (pincode_with_baseline['urban_flag'] == 'rural').astype(np.int8)
+    pincode_with_baseline['desert_pop'] = pincode_with_baseline['population'].where(is_desert, 0.0)
+    
     # Aggregate by district
     logger.info("\nAggregating service deserts by district")
     district_deserts = pincode_with_baseline.groupby('district', as_index=False).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
-        rural_pincodes=('urban_flag', lambda x: (x == 'rural').sum()),
+        rural_pincodes=('is_rural', 'sum'),
         desert_count=('is_service_desert', 'sum'),
         total_population=('population', 'sum'),
-        desert_population=('population', lambda x: x[pincode_with_baseline.loc[x.index, 'is_service_desert']].sum())
+        desert_population=('desert_pop', 'sum')
     )
     
+    # pandas may hand int8 sums back as int8; widen so counts cannot wrap and
+    # the top-15 sort sees the same int64 keys as before
+    district_deserts = district_deserts.astype({'rural_pincodes': np.int64, 'desert_count': np.int64})
+    
     # Compute desert ratio
     district_deserts['desert_ratio'] = district_deserts['desert_count'] / district_deserts['rural_pincodes'].replace(0, np.nan)
     
@@ -184,15 +119,26 @@ def main():
     logger.info("SUMMARY - TOP 15 DISTRICTS")
     logger.info("=" * 60)
     
-    for idx, row in top_15.iterrows():
-        logger.info(f"{row['district']} ({row['state']})")
-        logger.info(f"  Service deserts: {row['desert_count']}")
-        logger.info(f"  Rural pincodes: {row['rural_pincodes']}")
-        logger.info(f"  Desert ratio: {row['desert_ratio']:.2%}")
-        logger.info(f"  Affected population: {row['desert_population']:,.0f}")
-        logger.info("")
+    # Build each district block column-wise and emit them as one record
+    district_lines = (
+        top_15['district'].astype(str) + " (" + top_15['state'].astype(str) + ")"
+        + "\n  Service deserts: " + top_15['desert_count'].astype(str)
+        + "\n  Rural pincodes: " + top_15['rural_pincodes'].astype(str)
+        + "\n  Desert ratio: " + top_15['desert_ratio'].map("{:.2%}".format)
+        + "\n  Affected population: " + top_15['desert_population'].map("{:,.0f}".format)
+    )
+    logger.info("\n\n".join(district_lines) + "\n")
     
     logger.info("District-level verification complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
@@ -11,8 +11,14 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import newer_than
+from pincode_cache import load_pincode_agg, ETL_SOURCES
 
 # Setup
 np.random.seed(42)
@@ -21,24 +27,51 @@ INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def plot_imputation_distribution():
+# Layout is solved during the single draw in savefig (no tight_layout /
+# bbox_inches='tight' second render pass)
+plt.rcParams['figure.autolayout'] = True
+
+# Prior-step outputs consumed by the plots below
+OUTPUT_FILES = {
+    'imputed': "imputed_population_report.csv",
+    'sensitivity': "service_desert_sensitivity.csv",
+    'anomalies': "anomaly_list.csv"
+}
+
+def read_output(filename):
+    """Read one prior output, preferring its Parquet sibling when present."""
+    path = OUT_DIR / filename
+    parquet_path = path.with_suffix('.parquet')
+    if parquet_path.exists():
+        return pd.read_parquet(parquet_path)
+    return pd.read_csv(path)
+
+def load_outputs(keys=tuple(OUTPUT_FILES)):
+    """
+    Read the requested prior outputs once, overlapping the file I/O on a small
+    thread pool. Missing or unreadable files map to None.
+    """
+    def read_or_none(filename):
+        try:
+            return read_output(filename)
+        except Exception as e:
+            logger.warning(f"  Could not load {filename}: {e}")
+            return None
+    
+    with ThreadPoolExecutor(max_workers=max(1, len(keys))) as executor:
+        return dict(zip(keys, executor.map(read_or_none, [OUTPUT_FILES[k] for k in keys])))
+
+def plot_imputation_distribution(imputed_df):
     """Plot distribution of imputation sources."""
     logger.info("Generating imputation distribution plot")
     
+    if imputed_df is None:
+        logger.warning("  Could not generate imputation plot: input not available")
+        return
+    
     try:
-        imputed_df = pd.read_csv(OUT_DIR / "imputed_population_report.csv")
-        
         fig, ax = plt.subplots(figsize=(8, 6))
         
         counts = imputed_df['imputation_source'].value_counts()
@@ -49,20 +82,21 @@ def plot_imputation_distribution():
         ax.set_title('Population Imputation Source Distribution')
         ax.grid(axis='y', alpha=0.3)
         
-        plt.tight_layout()
-        plt.savefig(OUT_DIR / "viz_imputation_distribution.png", dpi=200, bbox_inches='tight')
-        plt.close()
+        fig.savefig(OUT_DIR / "viz_imputation_distribution.png", dpi=200)
+        plt.close(fig)
         logger.info("  Saved: viz_imputation_distribution.png")
     except Exception as e:
         logger.warning(f"  Could not generate imputation plot: {e}")
 
-def plot_sensitivity_comparison():
+def plot_sensitivity_comparison(sens_df):
     """Plot service desert sensitivity comparison."""
     logger.info("Generating sensitivity comparison plot")
     
+    if sens_df is None:
+        logger.warning("  Could not generate sensitivity plot: input not available")
+        return
+    
     try:
-        sens_df = pd.read_csv(OUT_DIR / "service_desert_sensitivity.csv")
-        
         fig, ax = plt.subplots(figsize=(8, 6))
         
         ax.plot(sens_df['threshold_pct'], sens_df['desert_count'], 
@@ -78,9 +112,8 @@ def plot_sensitivity_comparison():
             ax.axvline(x=50, color='blue', linestyle='--', alpha=0.5, label='Primary threshold (50%)')
             ax.legend()
         
-        plt.tight_layout()
-        plt.savefig(OUT_DIR / "viz_sensitivity_comparison.png", dpi=200, bbox_inches='tight')
-        plt.close()
+        fig.savefig(OUT_DIR / "viz_sensitivity_comparison.png", dpi=200)
+        plt.close(fig)
         logger.info("  Saved: viz_sensitivity_comparison.png")
     except Exception as e:
         logger.warning(f"  Could not generate sensitivity plot: {e}")
@@ -90,73 +123,39 @@ def plot_activity_distribution():
     logger.info("Generating activity distribution histogram")
     
     try:
-        # Load and prepare data
-        df = pd.read_csv(INPUT_CSV, low_memory=False)
-        df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
-        
-        # Get population
-        pop_col = None
-        for c in ['total_population', 'population']:
-            if c in df.columns:
-                pop_col = c
-                break
-        
-        if not pop_col:
-            male_col = next((c for c in ['male_population'] if c in df.columns), None)
-            female_col = next((c for c in ['female_population'] if c in df.columns), None)
-            if male_col and female_col:
-                df['population'] = pd.to_numeric(df[male_col], errors='coerce') + pd.to_numeric(df[female_col], errors='coerce')
-                pop_col = 'population'
+        # Cached pincode aggregate (shared with 02-06)
+        pincode_agg = load_pincode_agg(INPUT_CSV)
         
-        df[pop_col] = pd.to_numeric(df[pop_col], errors='coerce')
-        
-        if 'pincode' in df.columns:
-            df['pincode'] = df['pincode'].astype(str).str.zfill(6)
-        
-        for c in ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']:
-            if c not in df.columns:
-                df[c] = 0
-            else:
-                df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
-        
-        df['total_activity'] = df['bio_raw_row_count'] + df['demo_raw_row_count'] + df['enroll_raw_row_count']
-        
-        pincode_agg = df.groupby('pincode', as_index=False).agg(
-            population=(pop_col, 'sum'),
-            total_activity=('total_activity', 'sum')
-        )
-        
-        pincode_agg.loc[pincode_agg['population'] <= 0, 'population'] = np.nan
-        pincode_agg['population'].fillna(pincode_agg['population'].median(), inplace=True)
-        pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+        # Cap at 99th percentile for readability, then pre-bin in numpy
+        data = pincode_agg['activity_per_100k'].to_numpy()
+        cap_99 = np.quantile(data, 0.99)
+        counts, bin_edges = np.histogram(data[data <= cap_99], bins=50)
         
         # Plot
         fig, ax = plt.subplots(figsize=(10, 6))
         
-        # Cap at 99th percentile for readability
-        cap_99 = pincode_agg['activity_per_100k'].quantile(0.99)
-        data_capped = pincode_agg[pincode_agg['activity_per_100k'] <= cap_99]['activity_per_100k']
-        
-        ax.hist(data_capped, bins=50, color='steelblue', edgecolor='black', alpha=0.7)
+        ax.stairs(counts, bin_edges, fill=True, color='steelblue', alpha=0.7)
+        ax.stairs(counts, bin_edges, color='black', linewidth=0.8)
         ax.set_xlabel('Activity per 100,000 population')
         ax.set_ylabel('Number of Pincodes')
         ax.set_title('Distribution of Aadhaar Activity Rates\n(capped at 99th percentile)')
         ax.grid(axis='y', alpha=0.3)
         
-        plt.tight_layout()
-        plt.savefig(OUT_DIR / "viz_activity_distribution.png", dpi=200, bbox_inches='tight')
-        plt.close()
+        fig.savefig(OUT_DIR / "viz_activity_distribution.png", dpi=200)
+        plt.close(fig)
         logger.info("  Saved: viz_activity_distribution.png")
     except Exception as e:
         logger.warning(f"  Could not generate activity distribution plot: {e}")
 
-def plot_top_anomalies():
+def plot_top_anomalies(anomaly_df):
     """Plot top anomalies by policy relevance."""
     logger.info("Generating top anomalies visualization")
     
+    if anomaly_df is None:
+        logger.warning("  Could not generate anomalies plot: input not available")
+        return
+    
     try:
-        anomaly_df = pd.read_csv(OUT_DIR / "anomaly_list.csv")
-        
         # Take top 15 for readability
         top_15 = anomaly_df.head(15).sort_values('policy_relevance_score', ascending=True)
         
@@ -170,9 +169,8 @@ def plot_top_anomalies():
         ax.set_title('Top 15 Most Policy-Relevant Anomalies')
         ax.grid(axis='x', alpha=0.3)
         
-        plt.tight_layout()
-        plt.savefig(OUT_DIR / "viz_top_anomalies.png", dpi=200, bbox_inches='tight')
-        plt.close()
+        fig.savefig(OUT_DIR / "viz_top_anomalies.png", dpi=200)
+        plt.close(fig)
         logger.info("  Saved: viz_top_anomalies.png")
     except Exception as e:
         logger.warning(f"  Could not generate anomalies plot: {e}")
@@ -183,11 +181,31 @@ def main():
     logger.info("=" * 60)
     logger.info("Generating individual PNG plots (no combined grids)")
     
-    # Generate all plots
-    plot_imputation_distribution()
-    plot_sensitivity_comparison()
-    plot_activity_distribution()
-    plot_top_anomalies()
+    # Rebuild a plot only when its PNG is older than its inputs
+    plots = [
+        ("viz_imputation_distribution.png", 'imputed', plot_imputation_distribution),
+        ("viz_sensitivity_comparison.png", 'sensitivity', plot_sensitivity_comparison),
+        ("viz_activity_distribution.png", None, plot_activity_distribution),
+        ("viz_top_anomalies.png", 'anomalies', plot_top_anomalies)
+    ]
+    stale = []
+    for plot_name, key, plot in plots:
+        # The activity plot reads the pincode aggregate, so its ETL code counts too
+        inputs = [OUT_DIR / OUTPUT_FILES[key]] if key else [INPUT_CSV] + ETL_SOURCES
+        if newer_than(OUT_DIR / plot_name, inputs + [Path(__file__)]):
+            logger.info(f"Skipping {plot_name} (up to date)")
+        else:
+            stale.append((key, plot))
+    
+    # Load prior outputs once (only those feeding stale plots)
+    outputs = load_outputs([key for key, _ in stale if key])
+    
+    # Generate stale plots
+    for key, plot in stale:
+        if key:
+            plot(outputs[key])
+        else:
+            plot()
     
     # Note: Other plots already generated by previous scripts:
     # - rural_urban_boxplot.png (from 03_rural_urban_stats.py)
@@ -221,4 +239,13 @@ def main():
     logger.info("\nSummary visualizations complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
@@ -11,40 +11,49 @@ Output: antigravity_report.md
 
 import pandas as pd
 import numpy as np
+import pyarrow.csv as pv
 from pathlib import Path
 import logging
 import json
+import functools
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # Setup
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=32)
+def _read_json(path_str, mtime):
+    """Parse a JSON file; cached per (path, mtime) so a rewritten file is re-read."""
+    with open(path_str, 'r') as f:
+        return json.load(f)
+
+@functools.lru_cache(maxsize=32)
+def _read_table(path_str, mtime):
+    """Parse a Parquet or CSV table; cached per (path, mtime) like _read_json."""
+    if path_str.endswith('.parquet'):
+        return pd.read_parquet(path_str)
+    return pv.read_csv(path_str, convert_options=pv.ConvertOptions(strings_can_be_null=True)).to_pandas()
+
 def load_json(filename):
     """Load JSON file if it exists."""
     path = OUT_DIR / filename
     if path.exists():
-        with open(path, 'r') as f:
-            return json.load(f)
+        return _read_json(str(path), path.stat().st_mtime)
     return None
 
 def load_csv(filename):
-    """Load CSV file if it exists."""
+    """Load CSV file if it exists, preferring its Parquet sibling when present."""
     path = OUT_DIR / filename
+    parquet_path = path.with_suffix('.parquet')
+    if parquet_path.exists():
+        return _read_table(str(parquet_path), parquet_path.stat().st_mtime)
     if path.exists():
-        return pd.read_csv(path)
+        return _read_table(str(path), path.stat().st_mtime)
     return None
 
 def main():
@@ -55,286 +64,318 @@ def main():
     
     # Load all outputs
     logger.info("\nLoading analysis outputs")
-    imputation_report = load_csv("imputed_population_report.csv")
-    sensitivity_df = load_csv("service_desert_sensitivity.csv")
-    rural_urban_stats = load_json("rural_urban_comparison_stats.json")
-    rural_urban_medians = load_csv("rural_urban_medians.csv")
-    pop_activity_stats = load_json("pop_activity_stats.json")
-    anomaly_list = load_csv("anomaly_list.csv")
-    district_deserts = load_csv("district_deserts_top15.csv")
-    
-    # Start building report
-    logger.info("Generating markdown report")
-    
-    report = []
-    report.append("# Antigravity Data Validation Report")
-    report.append("")
-    report.append(f"**Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report.append("")
-    report.append("**Purpose:** This report provides validation checks, robustness tests, and boundary condition analysis for the UIDAI service desert analysis. All findings confirm and extend the results established in the main analytical notebook.")
-    report.append("")
-    report.append("---")
-    report.append("")
-    
-    # EXECUTIVE SUMMARY
-    report.append("## Executive Summary")
-    report.append("")
-    
-    summary_points = []
-    
-    # 1. Imputation rate
-    if imputation_report is not None:
-        imputed_count = (imputation_report['imputation_source'] != 'original').sum()
-        imputed_pct = 100 * imputed_count / len(imputation_report)
-        summary_points.append(f"**Population Imputation**: {imputed_pct:.1f}% of pincodes ({imputed_count:,}/{len(imputation_report):,}) required population imputation using district/state/global median hierarchy. The imputation logic is locked and validated for transparency only.")
-    
-    # 2. Desert sensitivity
-    if sensitivity_df is not None:
-        primary_count = sensitivity_df[sensitivity_df['threshold_pct'] == 50]['desert_count'].values[0]
-        low_count = sensitivity_df[sensitivity_df['threshold_pct'] == 40]['desert_count'].values[0]
-        high_count = sensitivity_df[sensitivity_df['threshold_pct'] == 60]['desert_count'].values[0]
-        pct_change_low = 100 * (low_count - primary_count) / primary_count
-        pct_change_high = 100 * (high_count - primary_count) / primary_count
-        summary_points.append(f"**Service Desert Sensitivity**: The primary operational definition (50% threshold) identifies **{primary_count:,} service deserts**. Robustness checks show {pct_change_low:+.1f}% change at 40% threshold and {pct_change_high:+.1f}% change at 60% threshold, confirming threshold stability.")
-    
-    # 3. Rural-urban gap
-    if rural_urban_stats is not None:
-        rural_median = rural_urban_stats['rural']['median']
-        urban_median = rural_urban_stats['urban']['median']
-        median_diff = rural_median - urban_median
-        cohens_d = rural_urban_stats['effect_size_cohens_d']
-        ci_lower = rural_urban_stats['bootstrap_95_ci']['lower']
-        ci_upper = rural_urban_stats['bootstrap_95_ci']['upper']
-        summary_points.append(f"**Rural-Urban Performance Gap**: Rural areas exhibit median activity of {rural_median:.1f} per 100k vs. urban {urban_median:.1f} per 100k (difference: {median_diff:.1f}, 95% CI: [{ci_lower:.1f}, {ci_upper:.1f}]). Effect size (Cohen's d = {cohens_d:.3f}) confirms substantial disparity.")
-    
-    # 4. Top outliers
-    if anomaly_list is not None:
-        top_outlier = anomaly_list.iloc[0]
-        summary_points.append(f"**Anomaly Detection**: {len(anomaly_list)} most policy-relevant anomalies identified using IQR and MAD methods. Top anomaly: pincode {top_outlier['pincode']} ({top_outlier['district']}, {top_outlier['state']}) with activity rate {top_outlier['activity_per_100k']:.1f} per 100k.")
+    loaders = {
+        'imputation_report': (load_csv, "imputed_population_report.csv"),
+        'sensitivity_df': (load_csv, "service_desert_sensitivity.csv"),
+        'rural_urban_stats': (load_json, "rural_urban_comparison_stats.json"),
+        'rural_urban_medians': (load_csv, "rural_urban_medians.csv"),
+        'pop_activity_stats': (load_json, "pop_activity_stats.json"),
+        'anomaly_list': (load_csv, "anomaly_list.csv"),
+        'district_deserts': (load_csv, "district_deserts_top15.csv")
+    }
     
-    # 5. Heteroskedasticity
-    if pop_activity_stats is not None:
-        het_result = pop_activity_stats['heteroskedasticity_test']['interpretation']
-        summary_points.append(f"**Population-Activity Relationship**: {het_result}. Correlation patterns are descriptive only and do NOT imply service adequacy or equity.")
+    # Independent reads, overlapped on a small thread pool (parsers release the GIL)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = {name: executor.submit(loader, filename) for name, (loader, filename) in loaders.items()}
+    outputs = {name: future.result() for name, future in futures.items()}
     
-    for i, point in enumerate(summary_points, 1):
-        report.append(f"{i}. {point}")
-        report.append("")
+    imputation_report = outputs['imputation_report']
+    sensitivity_df = outputs['sensitivity_df']
+    rural_urban_stats = outputs['rural_urban_stats']
+    rural_urban_medians = outputs['rural_urban_medians']
+    pop_activity_stats = outputs['pop_activity_stats']
+    anomaly_list = outputs['anomaly_list']
+    district_deserts = outputs['district_deserts']
     
-    report.append("---")
-    report.append("")
-    
-    # SECTION 1: Population Imputation Audit
-    report.append("## 1. Population Imputation Audit")
-    report.append("")
-    report.append("**Purpose:** Transparency report identifying which pincodes required population imputation. This is descriptive only; no recommendations for changes to the locked population logic are provided.")
-    report.append("")
-    
-    if imputation_report is not None:
-        report.append(f"**Total Pincodes Analyzed:** {len(imputation_report):,}")
-        report.append("")
-        report.append("### Imputation Source Breakdown")
-        report.append("")
+    # Stream the report to a sibling temp file (1 MiB write buffer, no
+    # in-memory copy) and swap it in only once complete, so a failure midway
+    # leaves the previous report intact
+    logger.info("Generating markdown report")
+    report_path = OUT_DIR / "antigravity_report.md"
+    tmp_path = report_path.with_suffix('.md.tmp')
+    generated_at = datetime.now()  # one timestamp for the header and footer
+    with open(tmp_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        def w(line):
+            f.write(line)
+            f.write("\n")
         
-        imputation_counts = imputation_report['imputation_source'].value_counts()
-        for source, count in imputation_counts.items():
-            pct = 100 * count / len(imputation_report)
-            report.append(f"- **{source}**: {count:,} pincodes ({pct:.2f}%)")
-        report.append("")
+        w("# Antigravity Data Validation Report")
+        w("")
+        w(f"**Generated:** {generated_at.strftime('%Y-%m-%d %H:%M:%S')}")
+        w("")
+        w("**Purpose:** This report provides validation checks, robustness tests, and boundary condition analysis for the UIDAI service desert analysis. All findings confirm and extend the results established in the main analytical notebook.")
+        w("")
+        w("---")
+        w("")
         
-        report.append("### Visualization")
-        report.append("")
-        report.append("![Imputation Distribution](viz_imputation_distribution.png)")
-        report.append("")
-        report.append("**Finding:** The hierarchical imputation strategy (district → state → global median) ensures no pincode has missing population data while preserving local context where available.")
-        report.append("")
-    
-    # SECTION 2: Service Desert Sensitivity Analysis
-    report.append("---")
-    report.append("")
-    report.append("## 2. Service Desert Sensitivity Analysis")
-    report.append("")
-    report.append("**Purpose:** Robustness check for the service desert definition. The **50% threshold is the primary operational definition**; 40% and 60% are tested strictly as sensitivity bounds.")
-    report.append("")
-    
-    if sensitivity_df is not None:
-        report.append("### Threshold Comparison")
-        report.append("")
-        report.append("| Threshold | Desert Count | Mean Gap (%) |")
-        report.append("|-----------|--------------|--------------|")
-        for _, row in sensitivity_df.iterrows():
-            marker = " **(PRIMARY)**" if row['threshold_pct'] == 50 else ""
-            report.append(f"| {row['threshold_pct']}%{marker} | {int(row['desert_count']):,} | {row['mean_gap_pct']:.2f}% |")
-        report.append("")
+        # EXECUTIVE SUMMARY
+        w("## Executive Summary")
+        w("")
         
-        report.append("### Visualization")
-        report.append("")
-        report.append("![Sensitivity Comparison](viz_sensitivity_comparison.png)")
-        report.append("")
-        report.append("**Finding:** The 50% threshold demonstrates good stability. Variation at boundary thresholds is within acceptable ranges for policy application.")
-        report.append("")
-    
-    # SECTION 3: Rural vs Urban Statistical Validation
-    report.append("---")
-    report.append("")
-    report.append("## 3. Rural vs Urban Statistical Validation")
-    report.append("")
-    report.append("**Purpose:** Validate the rural-urban activity disparity using rigorous statistical methods.")
-    report.append("")
-    
-    if rural_urban_stats is not None:
-        report.append("### Statistical Summary")
-        report.append("")
-        report.append(f"- **Rural Areas:**")
-        report.append(f"  - Sample size: {rural_urban_stats['rural']['n']:,} pincodes")
-        report.append(f"  - Median activity: {rural_urban_stats['rural']['median']:.2f} per 100k")
-        report.append(f"  - Mean activity: {rural_urban_stats['rural']['mean']:.2f} per 100k")
-        report.append("")
-        report.append(f"- **Urban Areas:**")
-        report.append(f"  - Sample size: {rural_urban_stats['urban']['n']:,} pincodes")
-        report.append(f"  - Median activity: {rural_urban_stats['urban']['median']:.2f} per 100k")
-        report.append(f"  - Mean activity: {rural_urban_stats['urban']['mean']:.2f} per 100k")
-        report.append("")
-        report.append(f"- **Effect Size (Cohen's d):** {rural_urban_stats['effect_size_cohens_d']:.3f}")
-        report.append(f"- **Mann-Whitney U Test:** p-value = {rural_urban_stats['mann_whitney_p_value']:.4e}")
-        report.append(f"- **Bootstrap 95% CI for Median Difference:** [{rural_urban_stats['bootstrap_95_ci']['lower']:.2f}, {rural_urban_stats['bootstrap_95_ci']['upper']:.2f}]")
-        report.append("")
+        summary_points = []
         
-        report.append("### Visualization")
-        report.append("")
-        report.append("![Rural vs Urban Boxplot](rural_urban_boxplot.png)")
-        report.append("")
-        report.append("**Finding:** The disparity between rural and urban areas is statistically significant (p < 0.001) with a large effect size. This confirms the structural nature of the service gap.")
-        report.append("")
-    
-    # SECTION 4: Population-Activity Correlation
-    report.append("---")
-    report.append("")
-    report.append("## 4. Population-Activity Correlation Analysis")
-    report.append("")
-    report.append("**Purpose:** Examine the relationship between population and activity. **IMPORTANT:** Correlation does NOT imply service adequacy or equity.")
-    report.append("")
-    
-    if pop_activity_stats is not None:
-        report.append("### Correlation Coefficients")
-        report.append("")
-        report.append(f"- **Pearson r:** {pop_activity_stats['pearson_correlation']['r']:.4f} (p = {pop_activity_stats['pearson_correlation']['p_value']:.4e})")
-        report.append(f"- **Spearman ρ:** {pop_activity_stats['spearman_correlation']['rho']:.4f} (p = {pop_activity_stats['spearman_correlation']['p_value']:.4e})")
-        report.append("")
+        # 1. Imputation rate
+        if imputation_report is not None:
+            imputed_count = (imputation_report['imputation_source'] != 'original').sum()
+            imputed_pct = 100 * imputed_count / len(imputation_report)
+            summary_points.append(f"**Population Imputation**: {imputed_pct:.1f}% of pincodes ({imputed_count:,}/{len(imputation_report):,}) required population imputation using district/state/global median hierarchy. The imputation logic is locked and validated for transparency only.")
         
-        report.append("### Robust Regression (Huber)")
-        report.append("")
-        report.append(f"- **Intercept:** {pop_activity_stats['huber_robust_regression']['intercept']:.4f}")
-        report.append(f"- **Slope:** {pop_activity_stats['huber_robust_regression']['slope']:.6f}")
-        report.append("")
+        # 2. Desert sensitivity
+        if sensitivity_df is not None:
+            primary_count = sensitivity_df[sensitivity_df['threshold_pct'] == 50]['desert_count'].values[0]
+            low_count = sensitivity_df[sensitivity_df['threshold_pct'] == 40]['desert_count'].values[0]
+            high_count = sensitivity_df[sensitivity_df['threshold_pct'] == 60]['desert_count'].values[0]
+            pct_change_low = 100 * (low_count - primary_count) / primary_count
+            pct_change_high = 100 * (high_count - primary_count) / primary_count
+            summary_points.append(f"**Service Desert Sensitivity**: The primary operational definition (50% threshold) identifies **{primary_count:,} service deserts**. Robustness checks show {pct_change_low:+.1f}% change at 40% threshold and {pct_change_high:+.1f}% change at 60% threshold, confirming threshold stability.")
         
-        report.append("### Heteroskedasticity Test")
-        report.append("")
-        report.append(f"- **Breusch-Pagan Statistic:** {pop_activity_stats['heteroskedasticity_test']['breusch_pagan_statistic']:.4f}")
-        report.append(f"- **P-value:** {pop_activity_stats['heteroskedasticity_test']['breusch_pagan_p_value']:.4e}")
-        report.append(f"- **Interpretation:** {pop_activity_stats['heteroskedasticity_test']['interpretation']}")
-        report.append("")
+        # 3. Rural-urban gap
+        if rural_urban_stats is not None:
+            rural_median = rural_urban_stats['rural']['median']
+            urban_median = rural_urban_stats['urban']['median']
+            median_diff = rural_median - urban_median
+            cohens_d = rural_urban_stats['effect_size_cohens_d']
+            ci_lower = rural_urban_stats['bootstrap_95_ci']['lower']
+            ci_upper = rural_urban_stats['bootstrap_95_ci']['upper']
+            summary_points.append(f"**Rural-Urban Performance Gap**: Rural areas exhibit median activity of {rural_median:.1f} per 100k vs. urban {urban_median:.1f} per 100k (difference: {median_diff:.1f}, 95% CI: [{ci_lower:.1f}, {ci_upper:.1f}]). Effect size (Cohen's d = {cohens_d:.3f}) confirms substantial disparity.")
         
-        report.append("### Visualizations")
-        report.append("")
-        report.append("![Population vs Activity Scatter](pop_activity_scatter.png)")
-        report.append("")
-        report.append("![Regression Diagnostics](regression_diagnostics.png)")
-        report.append("")
-        report.append("**Finding:** Weak correlation patterns exist, but significant heteroskedasticity indicates variance in service delivery is not uniform across population scales. This descriptive finding does NOT imply adequacy or equity.")
-        report.append("")
-    
-    # SECTION 5: Outlier Detection
-    report.append("---")
-    report.append("")
-    report.append("## 5. Outlier and Anomaly Detection")
-    report.append("")
-    report.append("**Purpose:** Identify extreme activity_per_100k values using robust statistical methods. Output capped to top 100 most policy-relevant cases.")
-    report.append("")
-    
-    if anomaly_list is not None:
-        report.append(f"### Summary")
-        report.append("")
-        report.append(f"**Total Anomalies Reported:** {len(anomaly_list)}")
-        report.append("")
+        # 4. Top outliers
+        if anomaly_list is not None:
+            top_outlier = anomaly_list.iloc[0]
+            summary_points.append(f"**Anomaly Detection**: {len(anomaly_list)} most policy-relevant anomalies identified using IQR and MAD methods. Top anomaly: pincode {top_outlier['pincode']} ({top_outlier['district']}, {top_outlier['state']}) with activity rate {top_outlier['activity_per_100k']:.1f} per 100k.")
         
-        report.append("### Top 10 Most Policy-Relevant Anomalies")
-        report.append("")
-        report.append("| Rank | Pincode | District | State | Activity per 100k | District Avg | Reason |")
-        report.append("|------|---------|----------|-------|-------------------|--------------|--------|")
-        for i, row in anomaly_list.head(10).iterrows():
-            rank = i + 1
-            reason_short = row['reason_code'][:50] + "..." if len(row['reason_code']) > 50 else row['reason_code']
-            report.append(f"| {rank} | {row['pincode']} | {row['district']} | {row['state']} | {row['activity_per_100k']:.1f} | {row['district_activity_per_100k']:.1f} | {reason_short} |")
-        report.append("")
+        # 5. Heteroskedasticity
+        if pop_activity_stats is not None:
+            het_result = pop_activity_stats['heteroskedasticity_test']['interpretation']
+            summary_points.append(f"**Population-Activity Relationship**: {het_result}. Correlation patterns are descriptive only and do NOT imply service adequacy or equity.")
         
-        report.append("### Visualization")
-        report.append("")
-        report.append("![Top Anomalies](viz_top_anomalies.png)")
-        report.append("")
-        report.append("**Finding:** Detected anomalies represent extreme deviations that warrant further investigation. Reason codes provide context for prioritization.")
-        report.append("")
-    
-    # SECTION 6: District Verification
-    report.append("---")
-    report.append("")
-    report.append("## 6. District-Level Verification")
-    report.append("")
-    report.append("**Purpose:** Confirm top 15 districts by service desert concentration match prior notebook findings.")
-    report.append("")
-    
-    if district_deserts is not None:
-        report.append("### Top 15 Districts by Service Desert Count")
-        report.append("")
-        report.append("| Rank | District | State | Desert Count | Rural Pincodes | Desert Ratio |")
-        report.append("|------|----------|-------|--------------|----------------|--------------|")
-        for i, row in district_deserts.iterrows():
-            rank = i + 1
-            report.append(f"| {rank} | {row['district']} | {row['state']} | {int(row['desert_count'])} | {int(row['rural_pincodes'])} | {row['desert_ratio']:.1%} |")
-        report.append("")
+        for i, point in enumerate(summary_points, 1):
+            w(f"{i}. {point}")
+            w("")
         
-        report.append("### Visualization")
-        report.append("")
-        report.append("![District Desert Counts](district_desert_counts.png)")
-        report.append("")
-        report.append("**Finding:** Top districts confirmed. These results are consistent with the main notebook analysis.")
-        report.append("")
-    
-    # SECTION 7: Additional Visualizations
-    report.append("---")
-    report.append("")
-    report.append("## 7. Additional Visualizations")
-    report.append("")
-    report.append("### Activity Distribution")
-    report.append("")
-    report.append("![Activity Distribution](viz_activity_distribution.png)")
-    report.append("")
-    
-    # CONCLUSION
-    report.append("---")
-    report.append("")
-    report.append("## Conclusion")
-    report.append("")
-    report.append("This validation report confirms the robustness of the primary analysis:")
-    report.append("")
-    report.append("- Population imputation is transparent and follows a principled hierarchy")
-    report.append("- Service desert definition (50% threshold) is stable across sensitivity tests")
-    report.append("- Rural-urban disparities are statistically significant with large effect sizes")
-    report.append("- Population-activity relationships exhibit heteroskedasticity (descriptive finding only)")
-    report.append("- Outliers are systematically identified and prioritized for policy relevance")
-    report.append("- District-level aggregations are reproducible and consistent")
-    report.append("")
-    report.append("**All findings validate and extend the results established in the main analytical notebook. No new definitions, metrics, or narratives are introduced beyond boundary condition checks and robustness validation.**")
-    report.append("")
-    report.append("---")
-    report.append("")
-    report.append(f"*Report generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}*")
-    
-    # Write report
-    report_text = "\n".join(report)
-    report_path = OUT_DIR / "antigravity_report.md"
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(report_text)
+        w("---")
+        w("")
+        
+        # SECTION 1: Population Imputation Audit
+        w("## 1. Population Imputation Audit")
+        w("")
+        w("**Purpose:** Transparency report identifying which pincodes required population imputation. This is descriptive only; no recommendations for changes to the locked population logic are provided.")
+        w("")
+        
+        if imputation_report is not None:
+            w(f"**Total Pincodes Analyzed:** {len(imputation_report):,}")
+            w("")
+            w("### Imputation Source Breakdown")
+            w("")
+            
+            imputation_counts = imputation_report['imputation_source'].value_counts()
+            for source, count in imputation_counts.items():
+                pct = 100 * count / len(imputation_report)
+                w(f"- **{source}**: {count:,} pincodes ({pct:.2f}%)")
+            w("")
+            
+            w("### Visualization")
+            w("")
+            w("![Imputation Distribution](viz_imputation_distribution.png)")
+            w("")
+            w("**Finding:** The hierarchical imputation strategy (district → state → global median) ensures no pincode has missing population data while preserving local context where available.")
+            w("")
+        
+        # SECTION 2: Service Desert Sensitivity Analysis
+        w("---")
+        w("")
+        w("## 2. Service Desert Sensitivity Analysis")
+        w("")
+        w("**Purpose:** Robustness check for the service desert definition. The **50% threshold is the primary operational definition**; 40% and 60% are tested strictly as sensitivity bounds.")
+        w("")
+        
+        if sensitivity_df is not None:
+            w("### Threshold Comparison")
+            w("")
+            w("| Threshold | Desert Count | Mean Gap (%) |")
+            w("|-----------|--------------|--------------|")
+            for _, row in sensitivity_df.iterrows():
+                marker = " **(PRIMARY)**" if row['threshold_pct'] == 50 else ""
+                w(f"| {row['threshold_pct']}%{marker} | {int(row['desert_count']):,} | {row['mean_gap_pct']:.2f}% |")
+            w("")
+            
+            w("### Visualization")
+            w("")
+            w("![Sensitivity Comparison](viz_sensitivity_comparison.png)")
+            w("")
+            w("**Finding:** The 50% threshold demonstrates good stability. Variation at boundary thresholds is within acceptable ranges for policy application.")
+            w("")
+        
+        # SECTION 3: Rural vs Urban Statistical Validation
+        w("---")
+        w("")
+        w("## 3. Rural vs Urban Statistical Validation")
+        w("")
+        w("**Purpose:** Validate the rural-urban activity disparity using rigorous statistical methods.")
+        w("")
+        
+        if rural_urban_stats is not None:
+            w("### Statistical Summary")
+            w("")
+            w(f"- **Rural Areas:**")
+            w(f"  - Sample size: {rural_urban_stats['rural']['n']:,} pincodes")
+            w(f"  - Median activity: {rural_urban_stats['rural']['median']:.2f} per 100k")
+            w(f"  - Mean activity: {rural_urban_stats['rural']['mean']:.2f} per 100k")
+            w("")
+            w(f"- **Urban Areas:**")
+            w(f"  - Sample size: {rural_urban_stats['urban']['n']:,} pincodes")
+            w(f"  - Median activity: {rural_urban_stats['urban']['median']:.2f} per 100k")
+            w(f"  - Mean activity: {rural_urban_stats['urban']['mean']:.2f} per 100k")
+            w("")
+            w(f"- **Effect Size (Cohen's d):** {rural_urban_stats['effect_size_cohens_d']:.3f}")
+            w(f"- **Mann-Whitney U Test:** p-value = {rural_urban_stats['mann_whitney_p_value']:.4e}")
+            w(f"- **Bootstrap 95% CI for Median Difference:** [{rural_urban_stats['bootstrap_95_ci']['lower']:.2f}, {rural_urban_stats['bootstrap_95_ci']['upper']:.2f}]")
+            w("")
+            
+            w("### Visualization")
+            w("")
+            w("![Rural vs Urban Boxplot](rural_urban_boxplot.png)")
+            w("")
+            w("**Finding:** The disparity between rural and urban areas is statistically significant (p < 0.001) with a large effect size. This confirms the structural nature of the service gap.")
+            w("")
+        
+        # SECTION 4: Population-Activity Correlation
+        w("---")
+        w("")
+        w("## 4. Population-Activity Correlation Analysis")
+        w("")
+        w("**Purpose:** Examine the relationship between population and activity. **IMPORTANT:** Correlation does NOT imply service adequacy or equity.")
+        w("")
+        
+        if pop_activity_stats is not None:
+            w("### Correlation Coefficients")
+            w("")
+            w(f"- **Pearson r:** {pop_activity_stats['pearson_correlation']['r']:.4f} (p = {pop_activity_stats['pearson_correlation']['p_value']:.4e})")
+            w(f"- **Spearman ρ:** {pop_activity_stats['spearman_correlation']['rho']:.4f} (p = {pop_activity_stats['spearman_correlation']['p_value']:.4e})")
+            w("")
+            
+            w("### Robust Regression (Huber)")
+            w("")
+            w(f"- **Intercept:** {pop_activity_stats['huber_robust_regression']['intercept']:.4f}")
+            w(f"- **Slope:** {pop_activity_stats['huber_robust_regression']['slope']:.6f}")
+            w("")
+            
+            w("### Heteroskedasticity Test")
+            w("")
+            w(f"- **Breusch-Pagan Statistic:** {pop_activity_stats['heteroskedasticity_test']['breusch_pagan_statistic']:.4f}")
+            w(f"- **P-value:** {pop_activity_stats['heteroskedasticity_test']['breusch_pagan_p_value']:.4e}")
+            w(f"- **Interpretation:** {pop_activity_stats['heteroskedasticity_test']['interpretation']}")
+            w("")
+            
+            w("### Visualizations")
+            w("")
+            w("![Population vs Activity Scatter](pop_activity_scatter.png)")
+            w("")
+            w("![Regression Diagnostics](regression_diagnostics.png)")
+            w("")
+            w("**Finding:** Weak correlation patterns exist, but significant heteroskedasticity indicates variance in service delivery is not uniform across population scales. This descriptive finding does NOT imply adequacy or equity.")
+            w("")
+        
+        # SECTION 5: Outlier Detection
+        w("---")
+        w("")
+        w("## 5. Outlier and Anomaly Detection")
+        w("")
+        w("**Purpose:** Identify extreme activity_per_100k values using robust statistical methods. Output capped to top 100 most policy-relevant cases.")
+        w("")
+        
+        if anomaly_list is not None:
+            w(f"### Summary")
+            w("")
+            w(f"**Total Anomalies Reported:** {len(anomaly_list)}")
+            w("")
+            
+            w("### Top 10 Most Policy-Relevant Anomalies")
+            w("")
+            w("| Rank | Pincode | District | State | Activity per 100k | District Avg | Reason |")
+            w("|------|---------|----------|-------|-------------------|--------------|--------|")
+            
+            # Table rows built column-wise (no per-row iterrows boxing)
+            top_10 = anomaly_list.head(10)
+            rank = pd.Series(top_10.index + 1, index=top_10.index)
+            reason = top_10['reason_code']
+            reason_short = reason.where(reason.str.len() <= 50, reason.str[:50] + "...")
+            w("\n".join(
+                "| " + rank.astype(str) + " | " + top_10['pincode'].astype(str)
+                + " | " + top_10['district'].astype(str) + " | " + top_10['state'].astype(str)
+                + " | " + top_10['activity_per_100k'].map("{:.1f}".format)
+                + " | " + top_10['district_activity_per_100k'].map("{:.1f}".format)
+                + " | " + reason_short + " |"
+            ))
+            w("")
+            
+            w("### Visualization")
+            w("")
+            w("![Top Anomalies](viz_top_anomalies.png)")
+            w("")
+            w("**Finding:** Detected anomalies represent extreme deviations that warrant further investigation. Reason codes provide context for prioritization.")
+            w("")
+        
+        # SECTION 6: District Verification
+        w("---")
+        w("")
+        w("## 6. District-Level Verification")
+        w("")
+        w("**Purpose:** Confirm top 15 districts by service desert concentration match prior notebook findings.")
+        w("")
+        
+        if district_deserts is not None:
+            w("### Top 15 Districts by Service Desert Count")
+            w("")
+            w("| Rank | District | State | Desert Count | Rural Pincodes | Desert Ratio |")
+            w("|------|----------|-------|--------------|----------------|--------------|")
+            rank = pd.Series(district_deserts.index + 1, index=district_deserts.index)
+            w("\n".join(
+                "| " + rank.astype(str) + " | " + district_deserts['district'].astype(str)
+                + " | " + district_deserts['state'].astype(str)
+                + " | " + district_deserts['desert_count'].astype(int).astype(str)
+                + " | " + district_deserts['rural_pincodes'].astype(int).astype(str)
+                + " | " + district_deserts['desert_ratio'].map("{:.1%}".format) + " |"
+            ))
+            w("")
+            
+            w("### Visualization")
+            w("")
+            w("![District Desert Counts](district_desert_counts.png)")
+            w("")
+            w("**Finding:** Top districts confirmed. These results are consistent with the main notebook analysis.")
+            w("")
+        
+        # SECTION 7: Additional Visualizations
+        w("---")
+        w("")
+        w("## 7. Additional Visualizations")
+        w("")
+        w("### Activity Distribution")
+        w("")
+        w("![Activity Distribution](viz_activity_distribution.png)")
+        w("")
+        
+        # CONCLUSION
+        w("---")
+        w("")
+        w("## Conclusion")
+        w("")
+        w("This validation report confirms the robustness of the primary analysis:")
+        w("")
+        w("- Population imputation is transparent and follows a principled hierarchy")
+        w("- Service desert definition (50% threshold) is stable across sensitivity tests")
+        w("- Rural-urban disparities are statistically significant with large effect sizes")
+        w("- Population-activity relationships exhibit heteroskedasticity (descriptive finding only)")
+        w("- Outliers are systematically identified and prioritized for policy relevance")
+        w("- District-level aggregations are reproducible and consistent")
+        w("")
+        w("**All findings validate and extend the results established in the main analytical notebook. No new definitions, metrics, or narratives are introduced beyond boundary condition checks and robustness validation.**")
+        w("")
+        w("---")
+        w("")
+        w(f"*Report generated on {generated_at.strftime('%Y-%m-%d at %H:%M:%S')}*")
+    tmp_path.replace(report_path)
     
     logger.info(f"\nSaved consolidated report to {report_path}")
     
@@ -351,4 +392,13 @@ def main():
     logger.info("\nConsolidated report generation complete")
 
 if __name__ == "__main__":
+    # Configure logging (run_all sets up its own when importing this script)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
     main()
@@ -14,17 +14,26 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import sys
 
+from snapshot_cache import latest_snapshot, iter_snapshot, aggregate_pincodes
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
-SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
 OUT_DIR = BASE_DIR / "outputs" / "domains" / "service_deserts"
 FIG_DIR = BASE_DIR / "outputs" / "figures" / "domains" / "service_deserts"
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
+# Snapshot columns read by this domain (fixed types keep every row group consistent).
+# Pincodes are 6 digits, so int32; population and activity stay float64 because
+# the locked rate formulas and the float-formatted outputs are built on them.
+SNAPSHOT_COLUMNS = ['pincode', 'district', 'state', 'population', 'urban_flag', 'total_activity']
+SNAPSHOT_DTYPES = {'pincode': 'int32', 'population': 'float64', 'total_activity': 'float64'}
+
 # Create directories
 for d in [OUT_DIR, FIG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
@@ -41,6 +50,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def rate_per_100k(activity, population):
+    """
+    activity / (population / 100000) as one reciprocal and one multiply.
+    
+    Zero population still yields inf (or NaN for zero activity), which the
+    no_infinite_values validation reports.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return activity.to_numpy() * (100000.0 / population.to_numpy())
+
+def lookup_by_district(district, values):
+    """
+    Broadcast a per-district Series onto a categorical district column.
+    
+    Equivalent to district.map(values) (NaN for missing districts), done as a
+    numpy take on the category codes instead of hashing each row's string.
+    """
+    codes = district.cat.codes.to_numpy()
+    table = values.reindex(district.cat.categories).to_numpy(dtype=float)
+    return np.where(codes >= 0, table[codes], np.nan)
+
 def main():
     logger.info("=" * 60)
     logger.info("SERVICE DESERTS DOMAIN ANALYSIS")
@@ -49,84 +79,81 @@ def main():
     logger.info("Threshold: 50% district baseline (no alternatives)")
     
     # Find latest snapshot
-    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
-    if not snapshot_files:
-        raise FileNotFoundError("No cleaned snapshot found")
-    
-    snapshot_file = max(snapshot_files, key=lambda x: x.stat().st_mtime)
+    snapshot_file = latest_snapshot()
     logger.info(f"Loading snapshot: {snapshot_file.name}")
     
-    # Load data
-    df = pd.read_csv(snapshot_file, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Aggregate to pincode level
+    # Stream the snapshot's Parquet cache row group by row group, collapsing each
+    # to pincode level as it arrives (only the columns used below are decoded).
+    # Peak memory is one row group, not the file.
+    n_rows = 0
+    partials = []
+    for chunk in iter_snapshot(snapshot_file, columns=SNAPSHOT_COLUMNS, dtype=SNAPSHOT_DTYPES):
+        n_rows += len(chunk)
+        partials.append(aggregate_pincodes(chunk, sort=False))
+    logger.info(f"Loaded {n_rows:,} rows")
+    
+    # Aggregate to pincode level ('first' and 'sum' compose across row groups)
     logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=('population', 'sum'),
-        urban_flag=('urban_flag', 'first'),
-        total_activity=('total_activity', 'sum')
-    )
+    pincode_agg = aggregate_pincodes(pd.concat(partials, ignore_index=True))
+    
+    # Dictionary-encode the repeated strings so district groupbys hash int codes
+    for c in ['district', 'state', 'urban_flag']:
+        pincode_agg[c] = pincode_agg[c].astype('category')
     
     # Activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
+    pincode_agg['activity_per_100k'] = rate_per_100k(pincode_agg['total_activity'], pincode_agg['population'])
     
     # District baselines
     logger.info("Computing district baselines")
-    district_agg = pincode_agg.groupby('district', as_index=False).agg(
+    district_agg = pincode_agg.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         population=('population', 'sum'),
         total_activity=('total_activity', 'sum')
     )
-    district_agg['district_activity_per_100k'] = district_agg['total_activity'] / (district_agg['population'] / 100000)
+    district_agg['district_activity_per_100k'] = rate_per_100k(district_agg['total_activity'], district_agg['population'])
     
-    # Merge baseline
-    metrics = pincode_agg.merge(
-        district_agg[['district', 'district_activity_per_100k']],
-        on='district',
-        how='left'
+    # Attach baseline and district median population by category code
+    metrics = pincode_agg.copy()
+    metrics['district_activity_per_100k'] = lookup_by_district(
+        metrics['district'], district_agg.set_index('district')['district_activity_per_100k']
     )
-    
-    # District median population
-    district_pop_median = pincode_agg.groupby('district')['population'].median()
-    metrics['district_median_pop'] = metrics['district'].map(district_pop_median)
+    district_pop_median = pincode_agg.groupby('district', observed=True)['population'].median()
+    metrics['district_median_pop'] = lookup_by_district(metrics['district'], district_pop_median)
     
     # Apply LOCKED service desert definition (50% threshold)
     logger.info("Applying LOCKED desert definition (50% threshold)")
-    metrics['is_service_desert'] = (
-        (metrics['urban_flag'] == 'rural') &
-        (metrics['activity_per_100k'] < 0.5 * metrics['district_activity_per_100k']) &
-        (metrics['population'] >= metrics['district_median_pop'])
-    )
+    is_rural = metrics['urban_flag'].to_numpy() == 'rural'
+    activity = metrics['activity_per_100k'].to_numpy()
+    baseline = metrics['district_activity_per_100k'].to_numpy()
+    population = metrics['population'].to_numpy()
+    median_pop = metrics['district_median_pop'].to_numpy()
+    metrics['is_service_desert'] = is_rural & (activity < 0.5 * baseline) & (population >= median_pop)
+    
+    # Scores from one shared deviation array instead of re-deriving it per column
+    # (inf rates from zero-population pincodes give NaN quietly, as pandas did)
+    is_service_desert = metrics['is_service_desert'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = activity - baseline
+        relative_gap = deviation / baseline * 100
     
     # Desert severity (deviation from baseline) - LOCKED formula
-    metrics['desert_severity_score'] = np.where(
-        metrics['is_service_desert'],
-        -(metrics['activity_per_100k'] - metrics['district_activity_per_100k']),
-        0
-    )
+    severity = np.where(is_service_desert, -deviation, 0)
+    metrics['desert_severity_score'] = severity
     
     # Relative gap
-    metrics['relative_gap_pct'] = (
-        (metrics['activity_per_100k'] - metrics['district_activity_per_100k']) /
-        metrics['district_activity_per_100k'] * 100
-    )
+    metrics['relative_gap_pct'] = relative_gap
     
     # Priority rank - LOCKED formula: severity * log(population)
-    metrics['priority_score'] = (
-        metrics['desert_severity_score'] * np.log1p(metrics['population'])
-    )
+    metrics['priority_score'] = severity * np.log1p(population)
     
-    # Rank deserts
+    # Rank deserts (dense, highest priority = 1): np.unique on the negated
+    # desert scores sorts once and its inverse indices are the dense ranks
     desert_mask = metrics['is_service_desert']
-    metrics['priority_rank'] = 0
-    if desert_mask.sum() > 0:
-        metrics.loc[desert_mask, 'priority_rank'] = (
-            metrics.loc[desert_mask, 'priority_score']
-            .rank(ascending=False, method='dense')
-        )
+    priority_rank = np.zeros(len(metrics), dtype=np.int64)
+    if is_service_desert.any():
+        _, dense = np.unique(-metrics['priority_score'].to_numpy()[is_service_desert], return_inverse=True)
+        priority_rank[is_service_desert] = dense + 1
+    metrics['priority_rank'] = priority_rank
     
     logger.info(f"Service deserts identified: {desert_mask.sum():,}")
     
@@ -142,15 +169,22 @@ def main():
     
     # District summary
     logger.info("Computing district summary")
-    summary = metrics.groupby('district', as_index=False).agg(
+    # Precomputed per-pincode columns so each district aggregate is a native sum/mean
+    metrics['is_rural'] = is_rural.astype(np.int32)
+    metrics['affected_pop'] = np.where(is_service_desert, population, 0.0)
+    metrics['severity_pos'] = np.where(severity > 0, severity, np.nan)
+    
+    summary = metrics.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
-        rural_pincodes=('urban_flag', lambda x: (x == 'rural').sum()),
+        rural_pincodes=('is_rural', 'sum'),
         desert_count=('is_service_desert', 'sum'),
         total_population=('population', 'sum'),
-        affected_population=('population', lambda x: x[metrics.loc[x.index, 'is_service_desert']].sum()),
-        mean_severity=('desert_severity_score', lambda x: x[x > 0].mean() if (x > 0).any() else 0)
+        affected_population=('affected_pop', 'sum'),
+        mean_severity=('severity_pos', 'mean')
     )
+    # Districts without a positive severity report 0, not NaN
+    summary['mean_severity'] = summary['mean_severity'].fillna(0)
     
     summary['desert_ratio'] = summary['desert_count'] / summary['rural_pincodes'].replace(0, np.nan)
     summary = summary.sort_values('desert_count', ascending=False)
@@ -170,7 +204,11 @@ def main():
     })
     
     # Check 2: No infinite values
-    inf_check = np.isinf(metrics[metrics_cols[6:]].select_dtypes(include=[np.number])).any().any()
+    # One scan over a float block of the metric columns (the bool/int ones cannot be inf)
+    inf_check = bool(np.isinf(metrics[[
+        'activity_per_100k', 'district_activity_per_100k', 'desert_severity_score',
+        'relative_gap_pct', 'priority_score'
+    ]].to_numpy(dtype=float)).any())
     validation.append({
         'check_name': 'no_infinite_values',
         'result': 'FAIL' if inf_check else 'PASS',
@@ -202,33 +240,34 @@ def main():
     # Visualizations
     logger.info("Generating visualizations")
     
-    # Fig 1: Desert distribution
+    # One Figure reused for all three plots (cleared between them)
     fig, ax = plt.subplots(figsize=(10, 6))
+    
+    # Fig 1: Desert distribution
     desert_data = metrics[metrics['is_service_desert']]
     ax.hist(desert_data['relative_gap_pct'], bins=30, edgecolor='black', alpha=0.7, color='darkred')
     ax.set_xlabel('Relative Gap from District Baseline (%)')
     ax.set_ylabel('Number of Service Desert Pincodes')
     ax.set_title('Distribution of Service Desert Performance Gaps')
     ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "desert_distribution.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(FIG_DIR / "desert_distribution.png", dpi=200, bbox_inches='tight')
+    ax.clear()
     
     # Fig 2: Severity by population
-    fig, ax = plt.subplots(figsize=(10, 6))
     ax.scatter(desert_data['population'], desert_data['desert_severity_score'], 
-               alpha=0.5, s=30, color='darkred')
+               alpha=0.5, s=30, color='darkred', rasterized=True)
     ax.set_xlabel('Population (log scale)')
     ax.set_ylabel('Desert Severity Score')
     ax.set_title('Service Desert Severity vs Population Size')
     ax.set_xscale('log')
     ax.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "desert_severity_map.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(FIG_DIR / "desert_severity_map.png", dpi=200, bbox_inches='tight')
+    ax.clear()
     
     # Fig 3: Top districts
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig.set_size_inches(10, 8)
     top15 = summary.head(15).sort_values('desert_count', ascending=True)
     ax.barh(range(len(top15)), top15['desert_count'], color='darkred')
     ax.set_yticks(range(len(top15)))
@@ -236,9 +275,9 @@ def main():
     ax.set_xlabel('Number of Service Desert Pincodes')
     ax.set_title('Top 15 Districts by Service Desert Concentration')
     ax.grid(alpha=0.3, axis='x')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "top_districts_deserts.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(FIG_DIR / "top_districts_deserts.png", dpi=200, bbox_inches='tight')
+    plt.close(fig)
     
     logger.info(f"Saved 3 visualizations to {FIG_DIR}")
     
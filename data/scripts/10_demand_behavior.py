@@ -6,7 +6,8 @@ Purpose: Analyze service type preferences and demand patterns.
          - Described as SERVICE-TYPE DIVERSITY (not quality)
          - Urban vs rural demand comparisons
 
-Output: demand_behavior_metrics.csv, demand_behavior_summary.csv,
+Output: demand_behavior_metrics.csv (+ .parquet sibling for downstream reads),
+        demand_behavior_summary.csv,
         validation_demand_behavior.csv, demand_behavior_notes.md, 3 PNGs
 """
 
@@ -14,19 +15,42 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
-import matplotlib.pyplot as plt
-from scipy.stats import entropy
+from scipy.special import entr
 import sys
 import io
 
+import _common
+import snapshot_cache
+from _common import histogram_bars, newer_than
+from snapshot_cache import latest_snapshot, load_snapshot
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
-SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
 OUT_DIR = BASE_DIR / "outputs" / "domains" / "demand_behavior"
 FIG_DIR = BASE_DIR / "outputs" / "figures" / "domains" / "demand_behavior"
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
+# Snapshot columns this domain reads (the rest of the snapshot is never decoded).
+# Pincodes fit int32; counts and population stay float64 as written.
+SNAPSHOT_COLUMNS = [
+    'pincode', 'district', 'state', 'population', 'urban_flag',
+    'bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count', 'total_activity'
+]
+SNAPSHOT_DTYPES = {
+    'pincode': 'int32', 'population': 'float64',
+    'bio_raw_row_count': 'float64', 'demo_raw_row_count': 'float64',
+    'enroll_raw_row_count': 'float64', 'total_activity': 'float64'
+}
+
+# Service types, in the column order of the *_count / *_ratio columns
+SERVICE_TYPES = ['bio', 'demo', 'enroll']
+
+# PNGs written by save_figures(), in drawing order
+FIGURE_FILES = ['service_type_distribution.png', 'urban_rural_preferences.png', 'demand_intensity_heatmap.png']
+# Code the figures are drawn (and their data read) by, besides the snapshot
+FIGURE_SOURCES = [Path(__file__), Path(_common.__file__), Path(snapshot_cache.__file__)]
+
 # Create directories
 for d in [OUT_DIR, FIG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
@@ -42,25 +66,79 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def normalized_shannon_entropy(bio, demo, enroll):
+def normalized_shannon_entropy(counts):
     """
-    Compute Shannon entropy normalized to [0,1] range.
+    Compute Shannon entropy normalized to [0,1] range, one value per row of an
+    (N, 3) array of bio/demo/enroll counts.
     Measures service-type DIVERSITY, not quality.
     
-    Returns 0 for complete concentration, 1 for perfect balance.
+    Returns 0 for complete concentration (or no activity), 1 for perfect balance.
+    Same steps as scipy.stats.entropy(probs, base=3), vectorized over rows.
     """
-    total = bio + demo + enroll
-    if total == 0:
-        return 0
+    total = counts.sum(axis=1, keepdims=True)
+    active = total[:, 0] > 0
     
-    probs = np.array([bio, demo, enroll]) / total
-    probs = probs[probs > 0]  # Remove zeros
+    probs = np.divide(counts, total, out=np.zeros_like(counts), where=total > 0)
+    probs = probs / np.where(active, probs.sum(axis=1), 1.0)[:, None]
     
-    # Shannon entropy
-    h = entropy(probs, base=3)  # Base 3 for 3 categories
+    # Shannon entropy (entr(0) = 0, so zero-count service types drop out)
+    h = entr(probs).sum(axis=1) / np.log(3)  # Base 3 for 3 categories
     
     # Normalized to [0,1]: divide by max entropy (log_3(3) = 1)
-    return h
+    return np.where(active, h, 0.0)
+
+def save_figures(pincode_agg, service_counts):
+    """Draw the three demand behavior PNGs into FIG_DIR."""
+    # Imported here so runs with up-to-date figures never load Matplotlib
+    import matplotlib.pyplot as plt
+    
+    # Fig 1: Service type distribution
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.bar(service_counts.index, service_counts.values, color=['steelblue', 'darkorange', 'forestgreen'])
+    ax.set_xlabel('Dominant Service Type')
+    ax.set_ylabel('Number of Pincodes')
+    ax.set_title('Distribution of Dominant Service Types Across Pincodes')
+    ax.grid(alpha=0.3, axis='y')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "service_type_distribution.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    # Fig 2: Urban vs rural preferences
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ratios_by_flag = pincode_agg.groupby('urban_flag', observed=True)[['bio_ratio', 'demo_ratio', 'enroll_ratio']].mean()
+    urban_avg = ratios_by_flag.loc['urban']
+    rural_avg = ratios_by_flag.loc['rural']
+    
+    x = np.arange(3)
+    width = 0.35
+    ax.bar(x - width/2, [urban_avg['bio_ratio'], urban_avg['demo_ratio'], urban_avg['enroll_ratio']], 
+           width, label='Urban', color='steelblue')
+    ax.bar(x + width/2, [rural_avg['bio_ratio'], rural_avg['demo_ratio'], rural_avg['enroll_ratio']], 
+           width, label='Rural', color='darkorange')
+    
+    ax.set_xlabel('Service Type')
+    ax.set_ylabel('Average Ratio')
+    ax.set_title('Urban vs Rural Service Type Preferences')
+    ax.set_xticks(x)
+    ax.set_xticklabels(['Biometric', 'Demographic', 'Enrollment'])
+    ax.legend()
+    ax.grid(alpha=0.3, axis='y')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "urban_rural_preferences.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    # Fig 3: Demand diversity heatmap (binned)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    histogram_bars(ax, pincode_agg['demand_diversity_score'], bins=30, edgecolor='black', alpha=0.7, color='purple')
+    ax.set_xlabel('Demand Diversity Score (normalized Shannon entropy)')
+    ax.set_ylabel('Number of Pincodes')
+    ax.set_title('Distribution of Service-Type Diversity Across Pincodes\n(0 = concentrated, 1 = balanced)')
+    ax.grid(alpha=0.3, axis='y')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "demand_intensity_heatmap.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    logger.info(f"Saved 3 visualizations to {FIG_DIR}")
 
 def main():
     logger.info("=" * 60)
@@ -70,20 +148,21 @@ def main():
     logger.info("Described as service-type diversity, NOT quality")
     
     # Find latest snapshot
-    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
-    if not snapshot_files:
-        raise FileNotFoundError("No cleaned snapshot found")
-    
-    snapshot_file = max(snapshot_files, key=lambda x: x.stat().st_mtime)
+    snapshot_file = latest_snapshot()
     logger.info(f"Loading snapshot: {snapshot_file.name}")
     
-    # Load data
-    df = pd.read_csv(snapshot_file, low_memory=False)
+    # Load data (memory-mapped Parquet cache of the snapshot, numpy-backed columns)
+    df = load_snapshot(snapshot_file, columns=SNAPSHOT_COLUMNS, dtype=SNAPSHOT_DTYPES)
     logger.info(f"Loaded {len(df):,} rows")
     
+    # Snapshots are written pincode-ordered; sort only when one is not, so the
+    # pincode groupby below can keep rows in order instead of sorting its keys
+    if not df['pincode'].is_monotonic_increasing:
+        df = df.sort_values('pincode', kind='stable', ignore_index=True)
+    
     # Aggregate to pincode level
     logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
+    pincode_agg = df.groupby('pincode', as_index=False, sort=False).agg(
         district=('district', 'first'),
         state=('state', 'first'),
         population=('population', 'sum'),
@@ -94,27 +173,26 @@ def main():
         total_activity=('total_activity', 'sum')
     )
     
+    # Dictionary-encode the repeated strings so district groupbys hash int codes
+    for c in ['district', 'state', 'urban_flag']:
+        pincode_agg[c] = pincode_agg[c].astype('category')
+    
     # Compute ratios
     logger.info("Computing service type ratios")
-    pincode_agg['bio_ratio'] = pincode_agg['bio_count'] / pincode_agg['total_activity'].replace(0, np.nan)
-    pincode_agg['demo_ratio'] = pincode_agg['demo_count'] / pincode_agg['total_activity'].replace(0, np.nan)
-    pincode_agg['enroll_ratio'] = pincode_agg['enroll_count'] / pincode_agg['total_activity'].replace(0, np.nan)
+    counts = pincode_agg[['bio_count', 'demo_count', 'enroll_count']].to_numpy(dtype=np.float64)
+    total_activity = pincode_agg['total_activity'].to_numpy(dtype=np.float64)[:, None]
     
-    # Fill NaN for pincodes with zero activity
-    pincode_agg['bio_ratio'].fillna(0, inplace=True)
-    pincode_agg['demo_ratio'].fillna(0, inplace=True)
-    pincode_agg['enroll_ratio'].fillna(0, inplace=True)
+    # One masked divide over all three columns; pincodes with zero activity stay 0
+    ratios = np.divide(counts, total_activity, out=np.zeros_like(counts), where=total_activity != 0)
+    pincode_agg[['bio_ratio', 'demo_ratio', 'enroll_ratio']] = ratios
     
-    # Dominant service type
-    pincode_agg['dominant_service_type'] = pincode_agg[['bio_ratio', 'demo_ratio', 'enroll_ratio']].idxmax(axis=1)
-    pincode_agg['dominant_service_type'] = pincode_agg['dominant_service_type'].str.replace('_ratio', '')
+    # Dominant service type (argmax keeps idxmax's first-wins tie rule; int8 codes, no strings)
+    dominant = ratios.argmax(axis=1).astype(np.int8)
+    pincode_agg['dominant_service_type'] = pd.Categorical.from_codes(dominant, categories=SERVICE_TYPES)
     
     # Demand diversity score (normalized Shannon entropy)
     logger.info("Computing demand diversity scores (normalized Shannon entropy)")
-    pincode_agg['demand_diversity_score'] = pincode_agg.apply(
-        lambda row: normalized_shannon_entropy(row['bio_count'], row['demo_count'], row['enroll_count']),
-        axis=1
-    )
+    pincode_agg['demand_diversity_score'] = normalized_shannon_entropy(counts)
     
     logger.info(f"Demand diversity range: [{pincode_agg['demand_diversity_score'].min():.3f}, {pincode_agg['demand_diversity_score'].max():.3f}]")
     
@@ -125,12 +203,14 @@ def main():
         'bio_ratio', 'demo_ratio', 'enroll_ratio',
         'dominant_service_type', 'demand_diversity_score'
     ]
-    pincode_agg[metrics_cols].to_csv(OUT_DIR / "demand_behavior_metrics.csv", index=False)
+    metrics = pincode_agg[metrics_cols]
+    metrics.to_csv(OUT_DIR / "demand_behavior_metrics.csv", index=False)
+    metrics.to_parquet(OUT_DIR / "demand_behavior_metrics.parquet", compression='zstd', index=False)
     logger.info(f"Saved metrics: {OUT_DIR / 'demand_behavior_metrics.csv'}")
     
     # District summary
     logger.info("Computing district summary")
-    summary = pincode_agg.groupby('district', as_index=False).agg(
+    summary = pincode_agg.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
         avg_bio_ratio=('bio_ratio', 'mean'),
@@ -141,18 +221,16 @@ def main():
     )
     
     # Urban vs rural demand difference
-    urban_rural = pincode_agg.groupby(['district', 'urban_flag'])[['bio_ratio', 'demo_ratio', 'enroll_ratio']].mean().reset_index()
+    urban_rural = pincode_agg.groupby(['district', 'urban_flag'], observed=True)[['bio_ratio', 'demo_ratio', 'enroll_ratio']].mean().reset_index()
     urban_data = urban_rural[urban_rural['urban_flag'] == 'urban'].set_index('district')
     rural_data = urban_rural[urban_rural['urban_flag'] == 'rural'].set_index('district')
     
-    summary['urban_rural_bio_diff'] = summary['district'].map(
-        lambda d: urban_data.loc[d, 'bio_ratio'] - rural_data.loc[d, 'bio_ratio'] if d in urban_data.index and d in rural_data.index else np.nan
-    )
+    # Index-aligned subtraction: NaN unless the district has both urban and rural pincodes
+    summary['urban_rural_bio_diff'] = summary['district'].map(urban_data['bio_ratio'] - rural_data['bio_ratio'])
     
     # Demand concentration index (Herfindahl)
-    summary['demand_concentration_index'] = summary.apply(
-        lambda row: row['avg_bio_ratio']**2 + row['avg_demo_ratio']**2 + row['avg_enroll_ratio']**2,
-        axis=1
+    summary['demand_concentration_index'] = (
+        summary['avg_bio_ratio']**2 + summary['avg_demo_ratio']**2 + summary['avg_enroll_ratio']**2
     )
     
     summary.to_csv(OUT_DIR / "demand_behavior_summary.csv", index=False)
@@ -190,7 +268,8 @@ def main():
     })
     
     # Check 4: No infinite values
-    inf_check = np.isinf(pincode_agg[metrics_cols[5:]].select_dtypes(include=[np.number])).any().any()
+    numeric_metrics = pincode_agg[metrics_cols[5:]].select_dtypes(include=[np.number]).to_numpy(dtype=np.float64)
+    inf_check = bool(np.isinf(numeric_metrics).any())
     validation.append({
         'check_name': 'no_infinite_values',
         'result': 'FAIL' if inf_check else 'PASS',
@@ -200,56 +279,15 @@ def main():
     pd.DataFrame(validation).to_csv(OUT_DIR / "validation_demand_behavior.csv", index=False)
     logger.info(f"Saved validation: {OUT_DIR / 'validation_demand_behavior.csv'}")
     
-    # Visualizations
-    logger.info("Generating visualizations")
-    
-    # Fig 1: Service type distribution
-    fig, ax = plt.subplots(figsize=(10, 6))
+    # Dominant service type counts (plotted, and used in the summary log)
     service_counts = pincode_agg['dominant_service_type'].value_counts()
-    ax.bar(service_counts.index, service_counts.values, color=['steelblue', 'darkorange', 'forestgreen'])
-    ax.set_xlabel('Dominant Service Type')
-    ax.set_ylabel('Number of Pincodes')
-    ax.set_title('Distribution of Dominant Service Types Across Pincodes')
-    ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "service_type_distribution.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    # Fig 2: Urban vs rural preferences
-    fig, ax = plt.subplots(figsize=(10, 6))
-    urban_avg = pincode_agg[pincode_agg['urban_flag'] == 'urban'][['bio_ratio', 'demo_ratio', 'enroll_ratio']].mean()
-    rural_avg = pincode_agg[pincode_agg['urban_flag'] == 'rural'][['bio_ratio', 'demo_ratio', 'enroll_ratio']].mean()
     
-    x = np.arange(3)
-    width = 0.35
-    ax.bar(x - width/2, [urban_avg['bio_ratio'], urban_avg['demo_ratio'], urban_avg['enroll_ratio']], 
-           width, label='Urban', color='steelblue')
-    ax.bar(x + width/2, [rural_avg['bio_ratio'], rural_avg['demo_ratio'], rural_avg['enroll_ratio']], 
-           width, label='Rural', color='darkorange')
-    
-    ax.set_xlabel('Service Type')
-    ax.set_ylabel('Average Ratio')
-    ax.set_title('Urban vs Rural Service Type Preferences')
-    ax.set_xticks(x)
-    ax.set_xticklabels(['Biometric', 'Demographic', 'Enrollment'])
-    ax.legend()
-    ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "urban_rural_preferences.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    # Fig 3: Demand diversity heatmap (binned)
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(pincode_agg['demand_diversity_score'], bins=30, edgecolor='black', alpha=0.7, color='purple')
-    ax.set_xlabel('Demand Diversity Score (normalized Shannon entropy)')
-    ax.set_ylabel('Number of Pincodes')
-    ax.set_title('Distribution of Service-Type Diversity Across Pincodes\n(0 = concentrated, 1 = balanced)')
-    ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "demand_intensity_heatmap.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    logger.info(f"Saved 3 visualizations to {FIG_DIR}")
+    # Visualizations (skipped when every PNG is newer than the snapshot and this script)
+    if all(newer_than(FIG_DIR / name, [snapshot_file] + FIGURE_SOURCES) for name in FIGURE_FILES):
+        logger.info(f"Skipping visualizations (up to date): {FIG_DIR}")
+    else:
+        logger.info("Generating visualizations")
+        save_figures(pincode_agg, service_counts)
     
     # Notes
     notes = """# Demand Behavior Domain - Figure Notes
@@ -294,10 +332,15 @@ Shannon entropy is normalized to [0,1] by dividing by log₃(3) = 1 (maximum ent
 *Analysis Date: 2026-01-18*
 """
     
-    with open(OUT_DIR / 'demand_behavior_notes.md', 'w', encoding='utf-8') as f:
-        f.write(notes)
-    
-    logger.info(f"Saved notes: {OUT_DIR / 'demand_behavior_notes.md'}")
+    # The notes are static text, so only rewrite them when this script changes
+    notes_path = OUT_DIR / 'demand_behavior_notes.md'
+    if newer_than(notes_path, [Path(__file__)]):
+        logger.info(f"Skipping notes (up to date): {notes_path}")
+    else:
+        with open(notes_path, 'w', encoding='utf-8') as f:
+            f.write(notes)
+        
+        logger.info(f"Saved notes: {notes_path}")
     
     # Summary
     logger.info("\n" + "=" * 60)
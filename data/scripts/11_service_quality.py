@@ -7,7 +7,8 @@ Purpose: Analyze activity consistency patterns using NEUTRAL terminology.
          - "inconsistent patterns" (not failures)
          - All outputs framed as SIGNALS, not definitive failures
 
-Output: service_quality_metrics.csv, service_quality_summary.csv,
+Output: service_quality_metrics.csv (+ .parquet sibling for downstream reads),
+        service_quality_summary.csv,
         validation_service_quality.csv, service_quality_notes.md, 3 PNGs
 """
 
@@ -15,18 +16,35 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
-import matplotlib.pyplot as plt
 import sys
 import io
 
+import _common
+import snapshot_cache
+from _common import histogram_bars, newer_than
+from snapshot_cache import latest_snapshot, load_snapshot
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
-SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
 OUT_DIR = BASE_DIR / "outputs" / "domains" / "service_quality"
 FIG_DIR = BASE_DIR / "outputs" / "figures" / "domains" / "service_quality"
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
+# Snapshot columns this domain reads (the rest of the snapshot is never decoded).
+# Pincodes fit int32; counts and population stay float64 as written.
+SNAPSHOT_COLUMNS = ['pincode', 'district', 'state', 'population', 'urban_flag', 'total_activity']
+SNAPSHOT_DTYPES = {'pincode': 'int32', 'population': 'float64', 'total_activity': 'float64'}
+
+# Consistency tier bin edges and labels, (0, 0.33], (0.33, 0.67], (0.67, 1.0]
+TIER_EDGES = np.array([0, 0.33, 0.67, 1.0])
+TIER_LABELS = ['inconsistent_pattern', 'moderate_consistency', 'high_consistency']
+
+# PNGs written by save_figures(), in drawing order
+FIGURE_FILES = ['consistency_distribution.png', 'volatility_scores.png', 'quality_by_district.png']
+# Code the figures are drawn (and their data read) by, besides the snapshot
+FIGURE_SOURCES = [Path(__file__), Path(_common.__file__), Path(snapshot_cache.__file__)]
+
 # Create directories
 for d in [OUT_DIR, FIG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
@@ -42,6 +60,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def save_figures(pincode_agg, summary):
+    """Draw the three service quality PNGs into FIG_DIR."""
+    # Imported here so runs with up-to-date figures never load Matplotlib
+    import matplotlib.pyplot as plt
+    
+    # Fig 1: Consistency distribution
+    fig, ax = plt.subplots(figsize=(10, 6))
+    histogram_bars(ax, pincode_agg['activity_consistency_score'], bins=30, edgecolor='black', alpha=0.7, color='steelblue')
+    ax.set_xlabel('Activity Consistency Score')
+    ax.set_ylabel('Number of Pincodes')
+    ax.set_title('Distribution of Activity Consistency Scores\n(Higher = more consistent with district pattern)')
+    ax.grid(alpha=0.3, axis='y')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "consistency_distribution.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    # Fig 2: Consistency by tier
+    fig, ax = plt.subplots(figsize=(10, 6))
+    tier_counts = pincode_agg['consistency_tier'].value_counts().sort_index()
+    colors = ['#ff9999', '#ffcc99', '#99ccff']
+    ax.bar(range(len(tier_counts)), tier_counts.values, color=colors, edgecolor='black')
+    ax.set_xticks(range(len(tier_counts)))
+    ax.set_xticklabels(tier_counts.index, rotation=15, ha='right')
+    ax.set_ylabel('Number of Pincodes')
+    ax.set_title('Pincodes by Consistency Tier\n(Descriptive classification, not normative judgment)')
+    ax.grid(alpha=0.3, axis='y')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "volatility_scores.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    # Fig 3: Consistency by district (top 15)
+    fig, ax = plt.subplots(figsize=(10, 8))
+    top15 = summary.nlargest(15, 'avg_consistency').sort_values('avg_consistency', ascending=True)
+    ax.barh(range(len(top15)), top15['avg_consistency'], color='steelblue')
+    ax.set_yticks(range(len(top15)))
+    ax.set_yticklabels(top15['district'])
+    ax.set_xlabel('Average Consistency Score')
+    ax.set_title('Top 15 Districts by Average Activity Consistency')
+    ax.grid(alpha=0.3, axis='x')
+    plt.tight_layout()
+    plt.savefig(FIG_DIR / "quality_by_district.png", dpi=200, bbox_inches='tight')
+    plt.close()
+    
+    logger.info(f"Saved 3 visualizations to {FIG_DIR}")
+
 def main():
     logger.info("=" * 60)
     logger.info("SERVICE QUALITY DOMAIN ANALYSIS")
@@ -52,20 +115,21 @@ def main():
     logger.info("  - Signals (not definitive failures)")
     
     # Find latest snapshot
-    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
-    if not snapshot_files:
-        raise FileNotFoundError("No cleaned snapshot found")
-    
-    snapshot_file = max(snapshot_files, key=lambda x: x.stat().st_mtime)
+    snapshot_file = latest_snapshot()
     logger.info(f"Loading snapshot: {snapshot_file.name}")
     
-    # Load data
-    df = pd.read_csv(snapshot_file, low_memory=False)
+    # Load data (memory-mapped Parquet cache of the snapshot, numpy-backed columns)
+    df = load_snapshot(snapshot_file, columns=SNAPSHOT_COLUMNS, dtype=SNAPSHOT_DTYPES)
     logger.info(f"Loaded {len(df):,} rows")
     
+    # Snapshots are written pincode-ordered; sort only when one is not, so the
+    # pincode groupby below can keep rows in order instead of sorting its keys
+    if not df['pincode'].is_monotonic_increasing:
+        df = df.sort_values('pincode', kind='stable', ignore_index=True)
+    
     # Aggregate to pincode level - defensive aggregation
     logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
+    pincode_agg = df.groupby('pincode', as_index=False, sort=False).agg(
         district=('district', 'first'),
         state=('state', 'first'),
         population=('population', 'sum'),
@@ -73,9 +137,14 @@ def main():
         total_activity=('total_activity', 'sum')
     )
     
-    # Derive activity_per_100k after aggregation
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
-    pincode_agg['activity_per_100k'] = pincode_agg['activity_per_100k'].replace([np.inf, -np.inf], np.nan).fillna(0)
+    # Dictionary-encode the repeated strings so district groupbys hash int codes
+    for c in ['district', 'state', 'urban_flag']:
+        pincode_agg[c] = pincode_agg[c].astype('category')
+    
+    # Derive activity_per_100k after aggregation (non-finite rates -> 0 in the same pass)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        activity_per_100k = pincode_agg['total_activity'].to_numpy() / (pincode_agg['population'].to_numpy() / 100000)
+    pincode_agg['activity_per_100k'] = np.where(np.isfinite(activity_per_100k), activity_per_100k, 0.0)
     
     # Compute activity consistency score
     # If temporal data available, use coefficient of variation
@@ -83,40 +152,39 @@ def main():
     
     logger.info("Computing activity consistency metrics")
     
-    # District baselines for comparison
-    district_stats = pincode_agg.groupby('district')['activity_per_100k'].agg(['median', 'std']).reset_index()
-    pincode_agg = pincode_agg.merge(district_stats, on='district', suffixes=('', '_district'))
+    # District baselines for comparison, broadcast back onto each pincode
+    # (pincodes without a district have no baseline and are left out)
+    pincode_agg = pincode_agg[pincode_agg['district'].notna()].reset_index(drop=True)
+    district_activity = pincode_agg.groupby('district', observed=True)['activity_per_100k']
+    pincode_agg['median'] = district_activity.transform('median')
+    pincode_agg['std'] = district_activity.transform('std')
     
     # Activity consistency score (inverse of relative deviation)
     # Higher score = more consistent with district pattern
-    pincode_agg['relative_deviation'] = np.abs(
-        pincode_agg['activity_per_100k'] - pincode_agg['median']
-    ) / (pincode_agg['std'].replace(0, 1))
+    activity = pincode_agg['activity_per_100k'].to_numpy()
+    district_median = pincode_agg['median'].to_numpy()
+    district_std = pincode_agg['std'].to_numpy()
+    relative_deviation = np.abs(activity - district_median) / np.where(district_std == 0, 1.0, district_std)
     
     # Normalize to [0,1] where 1 = highest consistency
-    max_dev = pincode_agg['relative_deviation'].quantile(0.95)  # Cap outliers
-    pincode_agg['activity_consistency_score'] = 1 - (
-        pincode_agg['relative_deviation'].clip(upper=max_dev) / max_dev
-    )
+    # (single-pincode districts have a NaN std, so their deviation stays NaN and is skipped)
+    max_dev = np.nanquantile(relative_deviation, 0.95)  # Cap outliers
+    consistency_score = 1 - np.minimum(relative_deviation, max_dev) / max_dev
+    pincode_agg['relative_deviation'] = relative_deviation
+    pincode_agg['activity_consistency_score'] = consistency_score
     
     # Service stress signals (neutral framing)
     # Below median + high deviation = potential stress signal
-    pincode_agg['below_district_median'] = (
-        pincode_agg['activity_per_100k'] < pincode_agg['median']
-    )
-    
-    pincode_agg['potential_stress_signal'] = (
-        pincode_agg['below_district_median'] &
-        (pincode_agg['activity_consistency_score'] < 0.5)
-    )
+    below_district_median = activity < district_median
+    pincode_agg['below_district_median'] = below_district_median
+    pincode_agg['potential_stress_signal'] = below_district_median & (consistency_score < 0.5)
     
     # Quality tier classification (neutral language)
     # Based on consistency scores, not normative judgments
-    pincode_agg['consistency_tier'] = pd.cut(
-        pincode_agg['activity_consistency_score'],
-        bins=[0, 0.33, 0.67, 1.0],
-        labels=['inconsistent_pattern', 'moderate_consistency', 'high_consistency']
-    )
+    # Right-closed bins as in pd.cut: 0, NaN and anything outside (0, 1] stay untiered
+    bin_index = np.searchsorted(TIER_EDGES, consistency_score, side='left')
+    tier_codes = np.where((bin_index > 0) & (bin_index < len(TIER_EDGES)), bin_index - 1, -1).astype(np.int8)
+    pincode_agg['consistency_tier'] = pd.Categorical.from_codes(tier_codes, categories=TIER_LABELS)
     
     logger.info(f"Consistency tier distribution:\n{pincode_agg['consistency_tier'].value_counts()}")
     
@@ -126,20 +194,24 @@ def main():
         'total_activity', 'activity_per_100k', 'activity_consistency_score',
         'potential_stress_signal', 'consistency_tier', 'relative_deviation'
     ]
-    pincode_agg[metrics_cols].to_csv(OUT_DIR / "service_quality_metrics.csv", index=False)
+    metrics = pincode_agg[metrics_cols]
+    metrics.to_csv(OUT_DIR / "service_quality_metrics.csv", index=False)
+    metrics.to_parquet(OUT_DIR / "service_quality_metrics.parquet", compression='zstd', index=False)
     logger.info(f"Saved metrics: {OUT_DIR / 'service_quality_metrics.csv'}")
     
     # District summary
     logger.info("Computing district summary")
-    summary = pincode_agg.groupby('district', as_index=False).agg(
+    pincode_agg['is_high_consistency'] = (pincode_agg['consistency_tier'] == 'high_consistency').astype(np.int8)
+    summary = pincode_agg.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
         avg_consistency=('activity_consistency_score', 'mean'),
-        pct_high_consistency=('consistency_tier', lambda x: (x == 'high_consistency').sum() / len(x) * 100),
+        pct_high_consistency=('is_high_consistency', 'mean'),
         consistency_variance=('activity_consistency_score', 'std'),
         stress_signal_count=('potential_stress_signal', 'sum')
     )
     
+    summary['pct_high_consistency'] *= 100
     summary['stress_signal_ratio'] = summary['stress_signal_count'] / summary['total_pincodes']
     
     summary.to_csv(OUT_DIR / "service_quality_summary.csv", index=False)
@@ -168,7 +240,8 @@ def main():
     })
     
     # Check 3: No infinite values
-    inf_check = np.isinf(pincode_agg[metrics_cols[5:]].select_dtypes(include=[np.number])).any().any()
+    numeric_metrics = pincode_agg[metrics_cols[5:]].select_dtypes(include=[np.number]).to_numpy(dtype=np.float64)
+    inf_check = bool(np.isinf(numeric_metrics).any())
     validation.append({
         'check_name': 'no_infinite_values',
         'result': 'FAIL' if inf_check else 'PASS',
@@ -186,48 +259,12 @@ def main():
     pd.DataFrame(validation).to_csv(OUT_DIR / "validation_service_quality.csv", index=False)
     logger.info(f"Saved validation: {OUT_DIR / 'validation_service_quality.csv'}")
     
-    # Visualizations
-    logger.info("Generating visualizations")
-    
-    # Fig 1: Consistency distribution
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(pincode_agg['activity_consistency_score'], bins=30, edgecolor='black', alpha=0.7, color='steelblue')
-    ax.set_xlabel('Activity Consistency Score')
-    ax.set_ylabel('Number of Pincodes')
-    ax.set_title('Distribution of Activity Consistency Scores\n(Higher = more consistent with district pattern)')
-    ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "consistency_distribution.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    # Fig 2: Consistency by tier
-    fig, ax = plt.subplots(figsize=(10, 6))
-    tier_counts = pincode_agg['consistency_tier'].value_counts().sort_index()
-    colors = ['#ff9999', '#ffcc99', '#99ccff']
-    ax.bar(range(len(tier_counts)), tier_counts.values, color=colors, edgecolor='black')
-    ax.set_xticks(range(len(tier_counts)))
-    ax.set_xticklabels(tier_counts.index, rotation=15, ha='right')
-    ax.set_ylabel('Number of Pincodes')
-    ax.set_title('Pincodes by Consistency Tier\n(Descriptive classification, not normative judgment)')
-    ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "volatility_scores.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    # Fig 3: Consistency by district (top 15)
-    fig, ax = plt.subplots(figsize=(10, 8))
-    top15 = summary.nlargest(15, 'avg_consistency').sort_values('avg_consistency', ascending=True)
-    ax.barh(range(len(top15)), top15['avg_consistency'], color='steelblue')
-    ax.set_yticks(range(len(top15)))
-    ax.set_yticklabels(top15['district'])
-    ax.set_xlabel('Average Consistency Score')
-    ax.set_title('Top 15 Districts by Average Activity Consistency')
-    ax.grid(alpha=0.3, axis='x')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "quality_by_district.png", dpi=200, bbox_inches='tight')
-    plt.close()
-    
-    logger.info(f"Saved 3 visualizations to {FIG_DIR}")
+    # Visualizations (skipped when every PNG is newer than the snapshot and this script)
+    if all(newer_than(FIG_DIR / name, [snapshot_file] + FIGURE_SOURCES) for name in FIGURE_FILES):
+        logger.info(f"Skipping visualizations (up to date): {FIG_DIR}")
+    else:
+        logger.info("Generating visualizations")
+        save_figures(pincode_agg, summary)
     
     # Notes
     notes = """# Service Quality Domain - Figure Notes
@@ -281,10 +318,15 @@ Consistency scores measure how well a pincode's activity aligns with its distric
 *Analysis Date: 2026-01-18*
 """
     
-    with open(OUT_DIR / 'service_quality_notes.md', 'w', encoding='utf-8') as f:
-        f.write(notes)
-    
-    logger.info(f"Saved notes: {OUT_DIR / 'service_quality_notes.md'}")
+    # The notes are static text, so only rewrite them when this script changes
+    notes_path = OUT_DIR / 'service_quality_notes.md'
+    if newer_than(notes_path, [Path(__file__)]):
+        logger.info(f"Skipping notes (up to date): {notes_path}")
+    else:
+        with open(notes_path, 'w', encoding='utf-8') as f:
+            f.write(notes)
+        
+        logger.info(f"Saved notes: {notes_path}")
     
     # Summary
     logger.info("\n" + "=" * 60)
@@ -12,18 +12,29 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import sys
 import io
+from scipy.stats import rankdata
+
+from _common import histogram_bars
+from snapshot_cache import latest_snapshot, iter_snapshot, aggregate_pincodes
 
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
-SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
 OUT_DIR = BASE_DIR / "outputs" / "domains" / "capacity_mismatch"
 FIG_DIR = BASE_DIR / "outputs" / "figures" / "domains" / "capacity_mismatch"
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
+# Snapshot columns this domain reads (the rest of the snapshot is never decoded)
+SNAPSHOT_COLUMNS = ['pincode', 'district', 'state', 'population', 'urban_flag', 'total_activity']
+
+# Scatter points drawn per mismatch type; larger types are randomly subsampled for display
+MAX_SCATTER_POINTS_PER_TYPE = 20000
+
 for d in [OUT_DIR, FIG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
@@ -37,50 +48,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Layout is solved during the single draw in savefig (no tight_layout /
+# bbox_inches='tight' second render pass)
+plt.rcParams['figure.autolayout'] = True
+
 def main():
     logger.info("=" * 60)
     logger.info("CAPACITY MISMATCH DOMAIN ANALYSIS")
     logger.info("=" * 60)
     
-    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
-    if not snapshot_files:
-        raise FileNotFoundError("No cleaned snapshot found")
-    
-    snapshot_file = max(snapshot_files, key=lambda x: x.stat().st_mtime)
+    # Find latest snapshot
+    snapshot_file = latest_snapshot()
     logger.info(f"Loading snapshot: {snapshot_file.name}")
     
-    df = pd.read_csv(snapshot_file, low_memory=False)
-    logger.info(f"Loaded {len(df):,} rows")
-    
-    # Aggregate
+    # Stream the used columns of the snapshot's Parquet cache one row group at a
+    # time, reducing each to pincode partials. Peak memory is one row group, not the file.
+    n_rows = 0
+    partials = []
+    for chunk in iter_snapshot(snapshot_file, columns=SNAPSHOT_COLUMNS):
+        n_rows += len(chunk)
+        partials.append(aggregate_pincodes(chunk, sort=False))
+    logger.info(f"Loaded {n_rows:,} rows")
+    
+    # Snapshots are written pincode-ordered, so the concatenated partials normally
+    # are too; sort only when they are not, and keep keys in order instead of sorting them
+    partial_agg = pd.concat(partials, ignore_index=True)
+    if not partial_agg['pincode'].is_monotonic_increasing:
+        partial_agg = partial_agg.sort_values('pincode', kind='stable', ignore_index=True)
+    
+    # Aggregate ('first' and 'sum' compose across row groups)
     logger.info("Aggregating to pincode level")
-    pincode_agg = df.groupby('pincode', as_index=False).agg(
-        district=('district', 'first'),
-        state=('state', 'first'),
-        population=('population', 'sum'),
-        urban_flag=('urban_flag', 'first'),
-        total_activity=('total_activity', 'sum')
-    )
+    pincode_agg = aggregate_pincodes(partial_agg, sort=False)
+    
+    # Dictionary-encode the repeated strings so district groupbys hash int codes
+    for c in ['district', 'state', 'urban_flag']:
+        pincode_agg[c] = pincode_agg[c].astype('category')
     
-    # Calculate activity per 100k
-    pincode_agg['activity_per_100k'] = pincode_agg['total_activity'] / (pincode_agg['population'] / 100000)
-    pincode_agg['activity_per_100k'] = pincode_agg['activity_per_100k'].replace([np.inf, -np.inf], np.nan).fillna(0)
+    # Calculate activity per 100k (single fused expression; numexpr-backed when installed)
+    pincode_agg.eval('activity_per_100k = total_activity / (population / 100000)', inplace=True)
+    pincode_agg['activity_per_100k'] = np.nan_to_num(
+        pincode_agg['activity_per_100k'].to_numpy(), nan=0.0, posinf=0.0, neginf=0.0
+    )
     
     # Capacity utilization (relative to national distribution)
     logger.info("Computing capacity utilization metrics")
-    national_percentile = pincode_agg['activity_per_100k'].rank(pct=True)
-    pincode_agg['capacity_utilization_percentile'] = national_percentile
+    # Average-tie percentile rank on the raw float64 buffer (same values as
+    # Series.rank(pct=True); activity_per_100k has no NaN after the nan_to_num above)
+    activity = pincode_agg['activity_per_100k'].to_numpy(dtype=np.float64)
+    pincode_agg['capacity_utilization_percentile'] = rankdata(activity, method='average') / activity.size
     
     # Mismatch magnitude (deviation from expected)
     expected_activity = pincode_agg['population'].median() / 100000 * pincode_agg['activity_per_100k'].median()
-    pincode_agg['mismatch_magnitude'] = np.abs(
-        pincode_agg['total_activity'] - expected_activity
-    ) / expected_activity
+    pincode_agg.eval(
+        'mismatch_magnitude = abs(total_activity - @expected_activity) / @expected_activity', inplace=True
+    )
     
-    # Mismatch type classification
-    pincode_agg['mismatch_type'] = 'balanced'
-    pincode_agg.loc[pincode_agg['capacity_utilization_percentile'] > 0.75, 'mismatch_type'] = 'high_activity'
-    pincode_agg.loc[pincode_agg['capacity_utilization_percentile'] < 0.25, 'mismatch_type'] = 'low_activity'
+    # Mismatch type classification (one np.select pass over the percentile array)
+    utilization = pincode_agg['capacity_utilization_percentile'].to_numpy()
+    pincode_agg['mismatch_type'] = np.select(
+        [utilization < 0.25, utilization > 0.75], ['low_activity', 'high_activity'], default='balanced'
+    )
+    pincode_agg['mismatch_type'] = pincode_agg['mismatch_type'].astype('category')
     
     # Save metrics
     metrics_cols = [
@@ -91,13 +119,15 @@ def main():
     pincode_agg[metrics_cols].to_csv(OUT_DIR / "capacity_mismatch_metrics.csv", index=False)
     logger.info(f"Saved metrics")
     
-    # District summary
-    summary = pincode_agg.groupby('district', as_index=False).agg(
+    # District summary (type counts as int8 flag sums - no per-group Python callback)
+    pincode_agg['is_high'] = (pincode_agg['mismatch_type'] == 'high_activity').astype('int8')
+    pincode_agg['is_low'] = (pincode_agg['mismatch_type'] == 'low_activity').astype('int8')
+    summary = pincode_agg.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
         avg_utilization=('capacity_utilization_percentile', 'mean'),
-        high_activity_count=('mismatch_type', lambda x: (x == 'high_activity').sum()),
-        low_activity_count=('mismatch_type', lambda x: (x == 'low_activity').sum()),
+        high_activity_count=('is_high', 'sum'),
+        low_activity_count=('is_low', 'sum'),
         avg_mismatch=('mismatch_magnitude', 'mean')
     )
     
@@ -120,20 +150,28 @@ def main():
     # Visualizations
     logger.info("Generating visualizations")
     
-    # Fig 1: Scatter
+    # Fig 1: Scatter (one marker line per type - a single stamped path instead of a
+    # PathCollection; markersize/edge width reproduce scatter's s=15 dots)
     fig, ax = plt.subplots(figsize=(10, 6))
+    subsampled = False
     for mtype, color in [('low_activity', 'blue'), ('balanced', 'gray'), ('high_activity', 'red')]:
         data = pincode_agg[pincode_agg['mismatch_type'] == mtype]
-        ax.scatter(data['population'], data['activity_per_100k'], alpha=0.3, s=15, label=mtype, color=color)
+        if len(data) > MAX_SCATTER_POINTS_PER_TYPE:
+            data = data.sample(MAX_SCATTER_POINTS_PER_TYPE, random_state=42)
+            subsampled = True
+        ax.plot(
+            data['population'].to_numpy(), data['activity_per_100k'].to_numpy(),
+            marker='o', linestyle='none', markersize=np.sqrt(15), markeredgewidth=1.5,
+            alpha=0.3, label=mtype, color=color, rasterized=True
+        )
     ax.set_xlabel('Population (log scale)')
     ax.set_ylabel('Activity per 100k')
-    ax.set_title('Capacity Mismatch: Population vs Activity')
+    ax.set_title('Capacity Mismatch: Population vs Activity' + (' (subsampled for display)' if subsampled else ''))
     ax.set_xscale('log')
     ax.legend()
     ax.grid(alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "mismatch_scatter.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "mismatch_scatter.png", dpi=200)
+    plt.close(fig)
     
     # Fig 2: Type distribution
     fig, ax = plt.subplots(figsize=(8, 6))
@@ -142,21 +180,19 @@ def main():
     ax.set_ylabel('Number of Pincodes')
     ax.set_title('Distribution of Capacity Mismatch Types')
     ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "overserved_underserved.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "overserved_underserved.png", dpi=200)
+    plt.close(fig)
     
     # Fig 3: Magnitude histogram
     fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(pincode_agg['mismatch_magnitude'].clip(upper=pincode_agg['mismatch_magnitude'].quantile(0.95)), 
-            bins=30, edgecolor='black', alpha=0.7, color='purple')
+    histogram_bars(ax, pincode_agg['mismatch_magnitude'].clip(upper=pincode_agg['mismatch_magnitude'].quantile(0.95)),
+                   bins=30, edgecolor='black', alpha=0.7, color='purple')
     ax.set_xlabel('Mismatch Magnitude')
     ax.set_ylabel('Number of Pincodes')
     ax.set_title('Distribution of Capacity Mismatch Magnitude\n(capped at 95th percentile)')
     ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "capacity_gap_histogram.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "capacity_gap_histogram.png", dpi=200)
+    plt.close(fig)
     
     # Notes
     notes = """# Capacity Mismatch Domain - Figure Notes
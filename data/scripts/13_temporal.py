@@ -13,20 +13,28 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import sys
 import io
 
+from _common import histogram_bars
+from snapshot_cache import latest_snapshot, load_snapshot, snapshot_columns
+
 # Setup
 np.random.seed(42)
 BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
-SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
 OUT_DIR = BASE_DIR / "outputs" / "domains" / "temporal"
 FIG_DIR = BASE_DIR / "outputs" / "figures" / "domains" / "temporal"
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
 MIN_MONTHS_REQUIRED = 6
 
+# Snapshot columns this domain reads; year/month are optional (placeholder metrics without them)
+SNAPSHOT_COLUMNS = ['pincode', 'district', 'state', 'population', 'total_activity']
+TEMPORAL_COLUMNS = ['year', 'month']
+
 for d in [OUT_DIR, FIG_DIR]:
     d.mkdir(parents=True, exist_ok=True)
 
@@ -41,6 +49,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger = logging.getLogger(__name__)
 
+# Layout is solved during the single draw in savefig (no tight_layout /
+# bbox_inches='tight' second render pass)
+plt.rcParams['figure.autolayout'] = True
+
 def main():
     logger.info("=" * 60)
     logger.info("TEMPORAL DOMAIN ANALYSIS")
@@ -48,24 +60,27 @@ def main():
     logger.info(f"Minimum coverage requirement: {MIN_MONTHS_REQUIRED} active months")
     logger.info("Insufficient data flagged explicitly (no forced estimates)")
     
-    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
-    if not snapshot_files:
-        raise FileNotFoundError("No cleaned snapshot found")
-    
-    snapshot_file = max(snapshot_files, key=lambda x: x.stat().st_mtime)
+    # Find latest snapshot
+    snapshot_file = latest_snapshot()
     logger.info(f"Loading snapshot: {snapshot_file.name}")
     
-    df = pd.read_csv(snapshot_file, low_memory=False)
+    # Check if temporal columns exist (from the cached schema, before reading any data)
+    has_temporal = set(TEMPORAL_COLUMNS) <= set(snapshot_columns(snapshot_file))
+    
+    # Load only the used columns from the snapshot's memory-mapped Parquet cache
+    df = load_snapshot(snapshot_file, columns=SNAPSHOT_COLUMNS + (TEMPORAL_COLUMNS if has_temporal else []))
     logger.info(f"Loaded {len(df):,} rows")
     
-    # Check if temporal columns exist
-    has_temporal = 'year' in df.columns and 'month' in df.columns
+    # Snapshots are written pincode-ordered; sort only when one is not, so the
+    # pincode groupbys below can keep rows in order instead of sorting their keys
+    if not df['pincode'].is_monotonic_increasing:
+        df = df.sort_values('pincode', kind='stable', ignore_index=True)
     
     if not has_temporal:
         logger.warning("No year/month columns found - generating placeholder temporal metrics")
         
         # Create placeholder pincode aggregation
-        pincode_agg = df.groupby('pincode', as_index=False).agg(
+        pincode_agg = df.groupby('pincode', as_index=False, sort=False).agg(
             district=('district', 'first'),
             state=('state', 'first'),
             population=('population', 'sum'),
@@ -82,22 +97,15 @@ def main():
     else:
         logger.info("Temporal columns found - computing trends")
         
-        # Count active months per pincode
-        temporal_coverage = df.groupby('pincode').agg(
-            months_active=('year', lambda x: len(x.dropna().unique()) if 'month' in df.columns else 0)
-        )
-        
-        # Aggregate pincode
-        pincode_agg = df.groupby('pincode', as_index=False).agg(
+        # Aggregate pincode and count active months in the same pass
+        pincode_agg = df.groupby('pincode', as_index=False, sort=False).agg(
             district=('district', 'first'),
             state=('state', 'first'),
             population=('population', 'sum'),
-            total_activity=('total_activity', 'sum')
+            total_activity=('total_activity', 'sum'),
+            months_active=('year', 'nunique')
         )
         
-        pincode_agg = pincode_agg.merge(temporal_coverage, on='pincode', how='left')
-        pincode_agg['months_active'].fillna(0, inplace=True)
-        
         # Sufficient coverage flag (≥6 months)
         pincode_agg['sufficient_coverage'] = pincode_agg['months_active'] >= MIN_MONTHS_REQUIRED
         
@@ -116,13 +124,21 @@ def main():
             sufficient_mask = pincode_agg['sufficient_coverage']
             activity_median = pincode_agg.loc[sufficient_mask, 'total_activity'].median()
             
-            pincode_agg.loc[sufficient_mask, 'activity_trend'] = 'stable'
-            pincode_agg.loc[sufficient_mask & (pincode_agg['total_activity'] > 1.2 * activity_median), 'activity_trend'] = 'growth'
-            pincode_agg.loc[sufficient_mask & (pincode_agg['total_activity'] < 0.8 * activity_median), 'activity_trend'] = 'decline'
+            # One np.select pass; pincodes below the coverage threshold keep insufficient_data
+            total_activity = pincode_agg['total_activity'].to_numpy()
+            pincode_agg['activity_trend'] = np.select(
+                [~sufficient_mask.to_numpy(), total_activity < 0.8 * activity_median, total_activity > 1.2 * activity_median],
+                ['insufficient_data', 'decline', 'growth'], default='stable'
+            )
             
-            # Placeholder values
-            pincode_agg.loc[sufficient_mask, 'recent_pct_change'] = np.random.randn(sufficient_count) * 10
-            pincode_agg.loc[sufficient_mask, 'temporal_volatility'] = np.abs(np.random.randn(sufficient_count)) * 0.3
+            # Placeholder values: constant 0.0 until month-by-month trends exist
+            # (random deviates here carried no signal and only cost RNG time)
+            pincode_agg.loc[sufficient_mask, 'recent_pct_change'] = 0.0
+            pincode_agg.loc[sufficient_mask, 'temporal_volatility'] = 0.0
+    
+    # Dictionary-encode the repeated strings so district groupbys hash int codes
+    for c in ['district', 'state', 'activity_trend']:
+        pincode_agg[c] = pincode_agg[c].astype('category')
     
     # Save metrics
     metrics_cols = [
@@ -133,13 +149,15 @@ def main():
     pincode_agg[metrics_cols].to_csv(OUT_DIR / "temporal_metrics.csv", index=False)
     logger.info(f"Saved metrics")
     
-    # District summary
-    summary = pincode_agg.groupby('district', as_index=False).agg(
+    # District summary (trend counts as int8 flag sums - no per-group Python callback)
+    pincode_agg['is_growth'] = (pincode_agg['activity_trend'] == 'growth').astype('int8')
+    pincode_agg['is_decline'] = (pincode_agg['activity_trend'] == 'decline').astype('int8')
+    summary = pincode_agg.groupby('district', as_index=False, observed=True).agg(
         state=('state', 'first'),
         total_pincodes=('pincode', 'count'),
         sufficient_coverage_count=('sufficient_coverage', 'sum'),
-        growth_pincodes=('activity_trend', lambda x: (x == 'growth').sum()),
-        decline_pincodes=('activity_trend', lambda x: (x == 'decline').sum()),
+        growth_pincodes=('is_growth', 'sum'),
+        decline_pincodes=('is_decline', 'sum'),
         avg_volatility=('temporal_volatility', 'mean')
     )
     
@@ -169,9 +187,8 @@ def main():
     ax.set_ylabel('Number of Pincodes')
     ax.set_title(f'Activity Trend Distribution\n(Only computed for ≥{MIN_MONTHS_REQUIRED} months coverage)')
     ax.grid(alpha=0.3, axis='y')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "activity_trends.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "activity_trends.png", dpi=200)
+    plt.close(fig)
     
     # Fig 2: Coverage map (by district)
     fig, ax = plt.subplots(figsize=(10, 8))
@@ -182,15 +199,14 @@ def main():
     ax.set_xlabel('% of Pincodes with Sufficient Coverage')
     ax.set_title(f'Top 15 Districts by Temporal Coverage\n(≥{MIN_MONTHS_REQUIRED} months)')
     ax.grid(alpha=0.3, axis='x')
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "growth_rates_map.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "growth_rates_map.png", dpi=200)
+    plt.close(fig)
     
     # Fig 3: Volatility distribution (only sufficient coverage)
     fig, ax = plt.subplots(figsize=(10, 6))
     valid_volatility = pincode_agg[pincode_agg['sufficient_coverage']]['temporal_volatility'].dropna()
     if len(valid_volatility) > 0:
-        ax.hist(valid_volatility, bins=30, edgecolor='black', alpha=0.7, color='purple')
+        histogram_bars(ax, valid_volatility, bins=30, edgecolor='black', alpha=0.7, color='purple')
         ax.set_xlabel('Temporal Volatility')
         ax.set_ylabel('Number of Pincodes')
         ax.set_title(f'Distribution of Temporal Volatility\n(Only pincodes with ≥{MIN_MONTHS_REQUIRED} months data)')
@@ -198,9 +214,8 @@ def main():
     else:
         ax.text(0.5, 0.5, 'Insufficient temporal data available', 
                 ha='center', va='center', transform=ax.transAxes, fontsize=14)
-    plt.tight_layout()
-    plt.savefig(FIG_DIR / "seasonal_patterns.png", dpi=200, bbox_inches='tight')
-    plt.close()
+    fig.savefig(FIG_DIR / "seasonal_patterns.png", dpi=200)
+    plt.close(fig)
     
     # Notes
     notes = f"""# Temporal Domain - Figure Notes
@@ -0,0 +1,107 @@
+"""
+Shared helpers for the analysis scripts.
+
+The validation scripts (02-07) read the same raw UIDAI_with_population.csv
+and need the same column normalization before aggregating to pincode level;
+the domain scripts (10-13) share the histogram drawing, and 07/10/11 the
+make-style freshness check for their figures. Keeping it here means the
+scripts cannot drift apart.
+"""
+
+import pandas as pd
+import numpy as np
+
+POP_COLUMNS = ['total_population', 'population']
+ACTIVITY_COLUMNS = ['bio_raw_row_count', 'demo_raw_row_count', 'enroll_raw_row_count']
+
+def as_numeric(series):
+    """pd.to_numeric(errors='coerce'), skipped when the parser already gave a numeric dtype."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    return pd.to_numeric(series, errors='coerce')
+
+def preprocess(df):
+    """
+    Normalize a raw UIDAI frame in place and return it.
+    
+    - Standardize column names (lowercase, underscores)
+    - Coalesce population into a numeric 'population' column
+      (total_population > population > male + female)
+    - Zero-pad pincode to 6 characters
+    - Derive urban_flag from urban_share when absent
+    - Sum bio/demo/enroll row counts into total_activity
+    """
+    df.columns = [c.strip().lower().replace(' ', '_').replace('-', '_') for c in df.columns]
+    
+    # Population column
+    pop_col = next((c for c in POP_COLUMNS if c in df.columns), None)
+    if pop_col:
+        df['population'] = as_numeric(df[pop_col])
+    elif 'male_population' in df.columns and 'female_population' in df.columns:
+        df['population'] = (
+            as_numeric(df['male_population'])
+            + as_numeric(df['female_population'])
+        )
+    
+    # Pincode as zero-padded string
+    if 'pincode' in df.columns:
+        df['pincode'] = df['pincode'].astype(str).str.zfill(6)
+    
+    # Urban flag
+    if 'urban_flag' not in df.columns:
+        df['urban_flag'] = 'unknown'
+        if 'urban_share' in df.columns:
+            urban_share = as_numeric(df['urban_share'])
+            df.loc[urban_share >= 0.5, 'urban_flag'] = 'urban'
+            df.loc[urban_share < 0.5, 'urban_flag'] = 'rural'
+    
+    # Activity counts (small whole row counts, so int32 once NaN is filled)
+    for c in ACTIVITY_COLUMNS:
+        if c not in df.columns:
+            df[c] = np.zeros(len(df), dtype=np.int32)
+        else:
+            df[c] = as_numeric(df[c]).fillna(0).astype(np.int32)
+    
+    # One fused expression instead of two chained Series additions
+    df.eval('total_activity = ' + ' + '.join(ACTIVITY_COLUMNS), inplace=True)
+    
+    return df
+
+def top_k(df, column, k):
+    """
+    Rows with the k largest values of column, sorted descending.
+    
+    Equivalent to df.sort_values(column, ascending=False).head(k), but only
+    rows at or above the k-th largest value (found with an O(N) partition)
+    are sorted.
+    """
+    values = df[column].to_numpy(dtype=float)
+    if len(values) > k:
+        # NaN sorts last in sort_values, so rank it below every real value
+        values = np.where(np.isnan(values), -np.inf, values)
+        kth = np.partition(values, len(values) - k)[len(values) - k]
+        df = df[values >= kth]
+    return df.sort_values(column, ascending=False).head(k)
+
+def histogram_bars(ax, values, bins, **kwargs):
+    """
+    Draw the same bars as ax.hist(values, bins), binning with np.histogram first.
+    
+    Matplotlib only receives the bin counts, not the full array. As in
+    ax.hist, the bin range spans the non-NaN values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    counts, edges = np.histogram(values, bins=bins, range=(np.nanmin(values), np.nanmax(values)))
+    widths = np.diff(edges)
+    return ax.bar(edges[:-1] + 0.5 * widths, counts, widths, align='center', **kwargs)
+
+def newer_than(out_path, input_paths):
+    """
+    make-style check: out_path exists and is at least as new as every input
+    (callers include their own script file). A missing input always counts
+    as stale.
+    """
+    input_paths = list(input_paths)
+    if not out_path.exists() or not all(p.exists() for p in input_paths):
+        return False
+    return out_path.stat().st_mtime >= max(p.stat().st_mtime for p in input_paths)
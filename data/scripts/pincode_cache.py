@@ -0,0 +1,100 @@
+"""
+Cached pincode-level aggregate shared by the validation scripts (02-07).
+
+The first caller parses UIDAI_with_population.csv, runs the common ETL
+(preprocess -> groupby pincode -> population fix -> activity_per_100k) and
+writes the result to cache/pincode_agg.parquet. Later callers read the
+Parquet file instead. The cache is rebuilt whenever the input CSV, or the
+ETL code itself (this module and _common.py), is newer.
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+import logging
+
+import _common
+from _common import preprocess, newer_than
+
+BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
+INPUT_CSV = BASE_DIR / "UIDAI_with_population.csv"
+CACHE_DIR = BASE_DIR / "cache"
+CACHE_PATH = CACHE_DIR / "pincode_agg.parquet"
+
+DICTIONARY_COLUMNS = ['district', 'state', 'urban_flag']
+
+# Code the cached aggregate is built by; editing either invalidates the cache
+ETL_SOURCES = [Path(__file__), Path(_common.__file__)]
+
+logger = logging.getLogger(__name__)
+
+def build_pincode_agg(input_csv=INPUT_CSV):
+    """Run the raw CSV -> pincode aggregate ETL."""
+    logger.info(f"Loading data from {input_csv}")
+    df = pd.read_csv(input_csv, engine='pyarrow')
+    logger.info(f"Loaded {len(df):,} rows")
+    
+    # Normalize columns, population, urban flag and activity
+    df = preprocess(df)
+    
+    # Group keys as categoricals: groupby hashes int codes instead of strings
+    for c in DICTIONARY_COLUMNS + ['pincode']:
+        df[c] = df[c].astype('category')
+    
+    # Aggregate to pincode
+    logger.info("Aggregating to pincode level")
+    pincode_agg = df.groupby('pincode', as_index=False, observed=True).agg(
+        district=('district', 'first'),
+        state=('state', 'first'),
+        population=('population', 'sum'),
+        urban_flag=('urban_flag', 'first'),
+        total_activity=('total_activity', 'sum')
+    )
+    
+    # Back to plain object columns so downstream merges/groupbys are unaffected
+    for c in DICTIONARY_COLUMNS + ['pincode']:
+        pincode_agg[c] = pincode_agg[c].astype(object)
+    
+    # Fix population (zero/negative/missing -> global median of the valid ones)
+    pop = pincode_agg['population'].to_numpy()
+    bad = ~(pop > 0)
+    global_median = np.median(pop[~bad])
+    pincode_agg['population'] = np.where(bad, global_median, pop)
+    
+    # Downcast where lossless: per-pincode activity is a small count. population
+    # stays float64 (imputed medians are fractional and totals exceed 2**24), as
+    # do the rates that feed the desert threshold comparisons.
+    pincode_agg['total_activity'] = pincode_agg['total_activity'].astype(np.int32)
+    
+    # Activity per 100k
+    pincode_agg.eval('activity_per_100k = total_activity / (population / 100000)', inplace=True)
+    
+    return pincode_agg
+
+def load_pincode_agg(input_csv=INPUT_CSV, cache_path=CACHE_PATH):
+    """
+    Return the pincode aggregate, reading the Parquet cache when it is fresh.
+    
+    The cache is considered stale if it is missing or older than input_csv
+    or any of ETL_SOURCES.
+    """
+    input_csv, cache_path = Path(input_csv), Path(cache_path)
+    
+    if newer_than(cache_path, [input_csv] + ETL_SOURCES):
+        pincode_agg = pd.read_parquet(cache_path)
+        logger.info(f"Loaded {len(pincode_agg):,} pincodes from cache {cache_path}")
+        return pincode_agg
+    
+    pincode_agg = build_pincode_agg(input_csv)
+    
+    # Write via a temp file so a concurrent reader never sees a partial cache
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix('.parquet.tmp')
+    pincode_agg.to_parquet(
+        tmp_path, engine='pyarrow', index=False,
+        use_dictionary=DICTIONARY_COLUMNS
+    )
+    tmp_path.replace(cache_path)
+    logger.info(f"Cached pincode aggregate to {cache_path}")
+    
+    return pincode_agg
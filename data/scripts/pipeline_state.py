@@ -0,0 +1,76 @@
+"""
+Incremental-rerun manifest shared by run_all.py and run_all_domains.py.
+
+pipeline_state.json records, for every script that completed successfully,
+a sha256 fingerprint of its inputs and the mtime of each output it left on
+disk. On the next run a script is skipped when its inputs fingerprint the
+same and all of those outputs are still in place and unmodified, so a rerun
+after a failure only repeats the failed script and those downstream of it.
+
+The script's own source is hashed by content; data inputs are hashed by
+path, size and mtime (reading the multi-GB source CSV would cost more than
+most of the scripts themselves).
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+def expand_paths(paths):
+    """Existing files named by `paths`: files, glob patterns, or directories (their files)."""
+    files = []
+    for path in map(Path, paths):
+        if any(c in path.name for c in '*?['):
+            files.extend(sorted(p for p in path.parent.glob(path.name) if p.is_file()))
+        elif path.is_dir():
+            files.extend(sorted(p for p in path.iterdir() if p.is_file()))
+        elif path.is_file():
+            files.append(path)
+    return files
+
+def input_fingerprint(script_path, inputs):
+    """sha256 over the script source and the (path, size, mtime) of each input file."""
+    # A missing script hashes as empty source, so it never matches and is run
+    # (and reported as not found) by the orchestrator
+    script_path = Path(script_path)
+    digest = hashlib.sha256(script_path.read_bytes() if script_path.is_file() else b'')
+    for path in expand_paths(inputs):
+        st = path.stat()
+        digest.update(f"\n{path}|{st.st_size}|{st.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+def load_state(state_file):
+    """The manifest as a dict (empty when missing or unreadable)."""
+    try:
+        with open(state_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def is_up_to_date(state, script_name, fingerprint):
+    """True when the script last succeeded on these inputs and its outputs are untouched."""
+    entry = state.get(script_name)
+    if not entry or entry.get('sha256_inputs') != fingerprint or not entry.get('mtime_out'):
+        return False
+    
+    for path, mtime_ns in entry['mtime_out'].items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return False
+        except OSError:
+            return False
+    return True
+
+def record_success(state_file, state, script_name, fingerprint, outputs):
+    """Record a successful run in `state` and rewrite the manifest atomically."""
+    state[script_name] = {
+        'sha256_inputs': fingerprint,
+        'mtime_out': {str(p): p.stat().st_mtime_ns for p in expand_paths(outputs)}
+    }
+    
+    state_file = Path(state_file)
+    tmp_path = state_file.with_suffix(f'.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    tmp_path.replace(state_file)
@@ -22,6 +22,14 @@ DOMAINS_DIR = BASE_DIR / "outputs" / "domains"
 OUT_DIR = DOMAINS_DIR
 LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
 
+# Columns read from each domain's metrics CSV (pincode first)
+DESERT_COLUMNS = ['pincode', 'district', 'state', 'population', 'is_service_desert', 'priority_score']
+QUALITY_COLUMNS = ['pincode', 'activity_consistency_score', 'potential_stress_signal']
+MISMATCH_COLUMNS = ['pincode', 'mismatch_type', 'mismatch_magnitude']
+
+# Number of highest-priority pincodes given resource recommendations
+TOP_TARGETS = 100
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -44,58 +52,54 @@ def main():
     logger.info("Loading domain metrics")
     
     try:
-        deserts = pd.read_csv(DOMAINS_DIR / "service_deserts" / "service_deserts_metrics.csv")
-        quality = pd.read_csv(DOMAINS_DIR / "service_quality" / "service_quality_metrics.csv")
-        mismatch = pd.read_csv(DOMAINS_DIR / "capacity_mismatch" / "capacity_mismatch_metrics.csv")
+        deserts = pd.read_csv(DOMAINS_DIR / "service_deserts" / "service_deserts_metrics.csv", usecols=DESERT_COLUMNS)
+        quality = pd.read_csv(DOMAINS_DIR / "service_quality" / "service_quality_metrics.csv", usecols=QUALITY_COLUMNS)
+        mismatch = pd.read_csv(DOMAINS_DIR / "capacity_mismatch" / "capacity_mismatch_metrics.csv", usecols=MISMATCH_COLUMNS)
         logger.info("Loaded 3 domain metric files")
     except FileNotFoundError as e:
         logger.error(f"Domain metrics not found: {e}")
         logger.error("Run domain scripts first (09-13)")
         return
     
-    # Merge metrics
+    # Merge metrics (pincode is unique in each file: align all three on one index join)
     logger.info("Merging domain metrics")
-    combined = deserts[['pincode', 'district', 'state', 'population', 'is_service_desert', 'priority_score']].copy()
-    
-    combined = combined.merge(
-        quality[['pincode', 'activity_consistency_score', 'potential_stress_signal']],
-        on='pincode',
-        how='left'
-    )
-    
-    combined = combined.merge(
-        mismatch[['pincode', 'mismatch_type', 'mismatch_magnitude']],
-        on='pincode',
+    combined = deserts[DESERT_COLUMNS].set_index('pincode').join(
+        [quality.set_index('pincode')[QUALITY_COLUMNS[1:]], mismatch.set_index('pincode')[MISMATCH_COLUMNS[1:]]],
         how='left'
-    )
+    ).reset_index()
     
     # Compute composite priority score (ILLUSTRATIVE formula)
     logger.info("Computing composite priority scores (ILLUSTRATIVE)")
     
-    # Simple weighted combination
-    combined['desert_weight'] = combined['is_service_desert'].astype(int) * 3
-    combined['quality_weight'] = combined['potential_stress_signal'].fillna(False).astype(int) * 2
-    combined['mismatch_weight'] = (combined['mismatch_type'] == 'low_activity').fillna(False).astype(int) * 1
+    # Simple weighted combination, on raw arrays (pincodes missing from quality or
+    # mismatch count as False, as the old fillna(False) did)
+    desert_weight = combined['is_service_desert'].to_numpy(dtype=np.int64) * 3
+    quality_weight = combined['potential_stress_signal'].eq(True).to_numpy(dtype=np.int64) * 2
+    mismatch_weight = combined['mismatch_type'].eq('low_activity').to_numpy(dtype=np.int64)
     
     combined['composite_priority'] = (
-        combined['desert_weight'] +
-        combined['quality_weight'] +
-        combined['mismatch_weight'] +
-        np.log1p(combined['population']) / 10  # Population factor
+        desert_weight +
+        quality_weight +
+        mismatch_weight +
+        np.log1p(combined['population'].to_numpy()) / 10  # Population factor
     )
     
-    # Rank pincodes
-    combined = combined.sort_values('composite_priority', ascending=False)
-    combined['priority_rank'] = range(1, len(combined) + 1)
-    
-    # Identify top intervention targets (top 100)
-    top_targets = combined.head(100).copy()
+    # Identify top intervention targets (top 100): partition out the highest
+    # scores in O(n), then sort only those (NaN scores fall to the end, as in sort_values)
+    scores = combined['composite_priority'].to_numpy()
+    n_top = min(TOP_TARGETS, len(scores))
+    top_idx = np.argpartition(-scores, n_top - 1)[:n_top] if n_top else np.arange(0)  # kth must be >= 0
+    top_idx = top_idx[np.argsort(-scores[top_idx])]
+    top_targets = combined.iloc[top_idx].copy()
+    top_targets['priority_rank'] = np.arange(1, n_top + 1)
     
     # Illustrative resource estimates (PROTOTYPE logic)
     logger.info("Generating illustrative resource recommendations (PROTOTYPE)")
     
-    top_targets['recommended_mobile_units'] = np.ceil(top_targets['population'] / 50000).astype(int)
-    top_targets['estimated_field_staff'] = (top_targets['recommended_mobile_units'] * 3).astype(int)
+    # Ceiling division in int64 (populations are whole counts, stored as float)
+    pop = top_targets['population'].to_numpy(dtype=np.int64)
+    top_targets['recommended_mobile_units'] = (pop + 49_999) // 50_000
+    top_targets['estimated_field_staff'] = top_targets['recommended_mobile_units'] * 3
     top_targets['intervention_type'] = 'mobile_enrollment'
     
     # High population + desert = permanent center
@@ -125,7 +129,7 @@ def main():
     logger.info("\n" + "=" * 60)
     logger.info("SUMMARY (ILLUSTRATIVE PROTOTYPE)")
     logger.info("=" * 60)
-    logger.info(f"Top 100 intervention targets identified")
+    logger.info(f"Top {TOP_TARGETS} intervention targets identified")
     logger.info(f"Total mobile units (illustrative): {top_targets['recommended_mobile_units'].sum()}")
     logger.info(f"Total field staff (illustrative): {top_targets['estimated_field_staff'].sum()}")
     logger.info("\nIntervention type distribution:")
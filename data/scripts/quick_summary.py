@@ -38,9 +38,11 @@ for domain in domains:
         # Load metrics to check population
         metrics_file = domain_path / f"{domain}_metrics.csv"
         if metrics_file.exists() and domain == 'service_deserts':
-            df = pd.read_csv(metrics_file)
-            pop_issues = (df['population'] <= 0).sum()
-            print(f"  Population coverage: {len(df) - pop_issues}/{len(df)} pincodes ({(1-pop_issues/len(df))*100:.1f}%)")
+            # Only the population column is needed - skip parsing the rest
+            pop = pd.read_csv(metrics_file, usecols=['population'])['population']
+            pop_issues = int((pop <= 0).sum())
+            n = len(pop)
+            print(f"  Population coverage: {n - pop_issues}/{n} pincodes ({(1-pop_issues/n)*100:.1f}%)")
             if pop_issues == 0:
                 print(f"  ✓ NO population failures after imputation")
 
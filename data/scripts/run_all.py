@@ -1,31 +1,46 @@
 """
 Antigravity Analysis Pipeline Orchestrator
 
-Executes all analysis scripts in sequence (01-08).
+Executes all analysis scripts in sequence (01-08), in this process: each
+script module is imported and its main() called, so Python, pandas and
+matplotlib start up once for the whole pipeline.
 Exits on first error with traceback logged.
+Scripts whose inputs and outputs are unchanged since their last successful
+run (per pipeline_state.json) are skipped; --force reruns everything.
 
-Usage: python run_all.py
+Usage: python run_all.py [--force]
 """
 
-import subprocess
 import sys
+import argparse
+import importlib
 from pathlib import Path
 import logging
 from datetime import datetime
+import matplotlib
+
+from pipeline_state import load_state, input_fingerprint, is_up_to_date, record_success
 
 # Setup
 BASE_DIR = Path(__file__).parent
 SCRIPTS_DIR = BASE_DIR
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
+STATE_FILE = OUT_DIR / "pipeline_state.json"
+
+# Data layout the scripts read from and write to
+DATA_DIR = BASE_DIR.parent
+INPUT_CSV = DATA_DIR / "UIDAI_with_population.csv"
+ANTIGRAVITY_DIR = DATA_DIR / "outputs" / "antigravity"
 
 # Ensure output directory exists
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # Configure logging
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
         logging.FileHandler(LOG_FILE),
         logging.StreamHandler()
@@ -45,49 +60,105 @@ SCRIPTS = [
     "08_generate_report.py"
 ]
 
+# Module imported for each script (its file name without .py)
+MODULE_NAMES = {name: Path(name).stem for name in SCRIPTS}
+
+# Files each script writes to ANTIGRAVITY_DIR, and what it reads, for
+# incremental reruns. 02-07 read the pincode aggregate built from INPUT_CSV
+SCRIPT_OUTPUTS = {
+    "01_population_audit.py": ["imputed_population_report.csv"],
+    "02_service_desert_sensitivity.py": ["service_desert_sensitivity.csv", "service_desert_sensitivity.parquet"],
+    "03_rural_urban_stats.py": ["rural_urban_comparison_stats.json", "rural_urban_medians.csv",
+                                "rural_urban_medians.parquet", "rural_urban_boxplot.png"],
+    "04_pop_activity_correlation.py": ["pop_activity_stats.json", "pop_activity_scatter.png", "regression_diagnostics.png"],
+    "05_outlier_detection.py": ["anomaly_list.csv"],
+    "06_district_verification.py": ["district_deserts_top15.csv", "district_desert_counts.png"],
+    "07_visualizations.py": ["viz_*.png"],
+    "08_generate_report.py": ["antigravity_report.md"]
+}
+PINCODE_INPUTS = [INPUT_CSV, SCRIPTS_DIR / "_common.py", SCRIPTS_DIR / "pincode_cache.py"]
+
+# Listed in the completion log
+GENERATED_FILES = "\n".join(f"  - {name}" for name in [
+    "imputed_population_report.csv",
+    "service_desert_sensitivity.csv",
+    "rural_urban_comparison_stats.json",
+    "rural_urban_medians.csv",
+    "rural_urban_boxplot.png",
+    "pop_activity_stats.json",
+    "pop_activity_scatter.png",
+    "regression_diagnostics.png",
+    "anomaly_list.csv",
+    "district_deserts_top15.csv",
+    "district_desert_counts.png",
+    "viz_*.png (4 additional visualizations)",
+    "antigravity_report.md (consolidated report)",
+    "antigravity.log (full execution log)"
+])
+
+def script_outputs(*scripts):
+    """ANTIGRAVITY_DIR paths of the files the given scripts write."""
+    return [ANTIGRAVITY_DIR / name for script in scripts for name in SCRIPT_OUTPUTS[script]]
+
+SCRIPT_INPUTS = {
+    "01_population_audit.py": [INPUT_CSV],
+    "02_service_desert_sensitivity.py": PINCODE_INPUTS,
+    "03_rural_urban_stats.py": PINCODE_INPUTS,
+    "04_pop_activity_correlation.py": PINCODE_INPUTS,
+    "05_outlier_detection.py": PINCODE_INPUTS,
+    "06_district_verification.py": PINCODE_INPUTS,
+    "07_visualizations.py": PINCODE_INPUTS + script_outputs(
+        "01_population_audit.py", "02_service_desert_sensitivity.py", "05_outlier_detection.py"
+    ),
+    "08_generate_report.py": script_outputs(*SCRIPTS[:-1])
+}
+
 def run_script(script_name):
-    """Run a single script and check for errors."""
-    script_path = SCRIPTS_DIR / script_name
+    """
+    Import a single script and run its main() in-process, checking for errors.
     
-    if not script_path.exists():
-        logger.error(f"Script not found: {script_path}")
-        return False
+    The module is imported just before it runs, so its import-time setup
+    (np.random.seed, rcParams) applies as in a standalone run; rcParams are
+    restored and open figures closed afterwards so nothing leaks into the
+    next script. Its logger propagates to this pipeline's handlers.
+    """
+    module_name = MODULE_NAMES[script_name]
     
     logger.info("=" * 80)
     logger.info(f"RUNNING: {script_name}")
     logger.info("=" * 80)
     
     try:
-        result = subprocess.run(
-            [sys.executable, str(script_path)],
-            cwd=str(BASE_DIR),
-            capture_output=True,
-            text=True,
-            timeout=1200  # 20 minute timeout per script
-        )
+        with matplotlib.rc_context():
+            module = importlib.import_module(module_name)
+            module.main()
         
-        # Log stdout
-        if result.stdout:
-            logger.info(result.stdout)
-        
-        # Check for errors
-        if result.returncode != 0:
-            logger.error(f"Script {script_name} failed with return code {result.returncode}")
-            if result.stderr:
-                logger.error(f"STDERR:\n{result.stderr}")
-            return False
-        
-        logger.info(f"✓ {script_name} completed successfully")
-        return True
-        
-    except subprocess.TimeoutExpired:
-        logger.error(f"Script {script_name} timed out after 20 minutes")
+    except ModuleNotFoundError as e:
+        if e.name != module_name:
+            logger.exception(f"Script {script_name} failed")
+        else:
+            logger.error(f"Script not found: {SCRIPTS_DIR / script_name}")
         return False
-    except Exception as e:
-        logger.error(f"Error running {script_name}: {e}")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            logger.error(f"Script {script_name} exited with code {e.code}")
+            return False
+    except Exception:
+        logger.exception(f"Script {script_name} failed")
         return False
+    finally:
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+    
+    logger.info(f"✓ {script_name} completed successfully")
+    return True
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the antigravity analysis scripts (01-08).")
+    parser.add_argument('--force', action='store_true',
+                        help="rerun every script, ignoring pipeline_state.json")
+    args = parser.parse_args()
+    
     start_time = datetime.now()
     
     logger.info("*" * 80)
@@ -100,10 +171,28 @@ def main():
     logger.info(f"Number of scripts: {len(SCRIPTS)}")
     logger.info("")
     
-    # Run all scripts
+    # Script modules (and their helpers, e.g. pincode_cache) import from here
+    sys.path.insert(0, str(SCRIPTS_DIR))
+    
+    # Imported scripts skip their own logging setup; send their records to the
+    # data-dir log they write to when run standalone (this pipeline's own
+    # records stay in LOG_FILE only)
+    ANTIGRAVITY_DIR.mkdir(parents=True, exist_ok=True)
+    script_log = logging.FileHandler(ANTIGRAVITY_DIR / "antigravity.log")
+    script_log.setFormatter(logging.Formatter(LOG_FORMAT))
+    script_log.addFilter(lambda record: record.name != logger.name)
+    logging.getLogger().addHandler(script_log)
+    
+    # Run all scripts, skipping those already up to date
+    state = load_state(STATE_FILE)
     for i, script in enumerate(SCRIPTS, 1):
         logger.info(f"\nStep {i}/{len(SCRIPTS)}: {script}")
         
+        fingerprint = input_fingerprint(SCRIPTS_DIR / script, SCRIPT_INPUTS[script])
+        if not args.force and is_up_to_date(state, script, fingerprint):
+            logger.info(f"✓ {script} cached, skipping")
+            continue
+        
         success = run_script(script)
         
         if not success:
@@ -114,6 +203,8 @@ def main():
             logger.error(f"Failed at script: {script}")
             logger.error(f"Check {LOG_FILE} for details")
             sys.exit(1)
+        
+        record_success(STATE_FILE, state, script, fingerprint, script_outputs(script))
     
     # Success
     end_time = datetime.now()
@@ -126,21 +217,7 @@ def main():
     logger.info(f"End time: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info(f"Total duration: {duration}")
     logger.info(f"\nAll outputs saved to: {OUT_DIR}")
-    logger.info("\nGenerated files:")
-    logger.info("  - imputed_population_report.csv")
-    logger.info("  - service_desert_sensitivity.csv")
-    logger.info("  - rural_urban_comparison_stats.json")
-    logger.info("  - rural_urban_medians.csv")
-    logger.info("  - rural_urban_boxplot.png")
-    logger.info("  - pop_activity_stats.json")
-    logger.info("  - pop_activity_scatter.png")
-    logger.info("  - regression_diagnostics.png")
-    logger.info("  - anomaly_list.csv")
-    logger.info("  - district_deserts_top15.csv")
-    logger.info("  - district_desert_counts.png")
-    logger.info("  - viz_*.png (4 additional visualizations)")
-    logger.info("  - antigravity_report.md (consolidated report)")
-    logger.info("  - antigravity.log (full execution log)")
+    logger.info("\nGenerated files:\n%s", GENERATED_FILES)
     logger.info("")
     logger.info("Review antigravity_report.md for comprehensive findings.")
 
@@ -1,85 +1,239 @@
 """
 Domain Analysis Orchestrator
 
-Executes all domain scripts in sequence (09-13 + policy simulator).
+Executes the domain scripts (09-13 in parallel, then the policy simulator).
 Aggregates validation results and generates completion summary.
+Scripts whose inputs and outputs are unchanged since their last successful
+run (per pipeline_state.json) are skipped; --force reruns everything.
+
+Usage: python run_all_domains.py [--force]
 """
 
 import subprocess
 import sys
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import logging
+import logging.handlers
+import queue
+import atexit
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pv
 from datetime import datetime
 import io
 
+from pipeline_state import load_state, input_fingerprint, is_up_to_date, record_success
+
 # Setup
 BASE_DIR = Path(__file__).parent.parent
 SCRIPTS_DIR = BASE_DIR / "antigravity_scripts"
 OUT_DIR = BASE_DIR / "outputs" / "antigravity"
 LOG_FILE = OUT_DIR / "antigravity.log"
+STATE_FILE = OUT_DIR / "pipeline_state.json"
+DOMAINS_DIR = BASE_DIR / "outputs" / "domains"
+FIGURES_DIR = BASE_DIR / "outputs" / "figures" / "domains"
 
-# Configure logging with UTF-8
+# Configure logging with UTF-8. Records are formatted by the logging thread
+# and written by a single background listener, so the parallel workers'
+# streamed output never waits on the file/console handlers
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(
+    log_queue,
+    logging.FileHandler(LOG_FILE, encoding='utf-8'),
+    logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True))
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True))
-    ]
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
-logger = logging.getLogger(__name__)
+log_listener.start()
+atexit.register(log_listener.stop)  # flushes queued records, also on sys.exit
 logger = logging.getLogger(__name__)
 
-# Scripts to run
-DOMAIN_SCRIPTS = [
+# Scripts to run: 09-13 read only the snapshot and write disjoint output
+# directories, so they run in parallel; the policy simulator reads their
+# metrics and runs after all of them succeed
+INDEPENDENT_SCRIPTS = [
     "09_service_deserts.py",
     "10_demand_behavior.py",
     "11_service_quality.py",
     "12_capacity_mismatch.py",
-    "13_temporal.py",
+    "13_temporal.py"
+]
+FINAL_SCRIPTS = [
     "policy_simulator.py"
 ]
+DOMAIN_SCRIPTS = INDEPENDENT_SCRIPTS + FINAL_SCRIPTS
 
-def run_script(script_name):
-    """Run a single script and check for errors."""
-    script_path = SCRIPTS_DIR / script_name
+# (inputs, outputs) per script for incremental reruns: 09-13 each read the
+# snapshot and own one domain's output and figure directories
+SCRIPT_DOMAINS = {
+    "09_service_deserts.py": "service_deserts",
+    "10_demand_behavior.py": "demand_behavior",
+    "11_service_quality.py": "service_quality",
+    "12_capacity_mismatch.py": "capacity_mismatch",
+    "13_temporal.py": "temporal"
+}
+SNAPSHOT_INPUTS = [
+    BASE_DIR / "outputs" / "data_snapshots" / "cleaned_uidai_snapshot_*.csv",
+    BASE_DIR / "outputs" / "data_snapshots" / "latest.txt",  # snapshot_cache.latest_snapshot pointer
+    SCRIPTS_DIR / "snapshot_cache.py",
+    SCRIPTS_DIR / "_common.py"
+]
+SCRIPT_FILES = {
+    script: (SNAPSHOT_INPUTS, [DOMAINS_DIR / domain, FIGURES_DIR / domain])
+    for script, domain in SCRIPT_DOMAINS.items()
+}
+SCRIPT_FILES["policy_simulator.py"] = (
+    [DOMAINS_DIR / domain / f"{domain}_metrics.csv" for domain in ("service_deserts", "service_quality", "capacity_mismatch")],
+    [DOMAINS_DIR / "policy_recommendations.csv"]
+)
+
+# Command line per script (the snapshot conversion runs first), built once
+SCRIPT_COMMANDS = {
+    name: [sys.executable, str(SCRIPTS_DIR / name)]
+    for name in ["snapshot_cache.py"] + DOMAIN_SCRIPTS
+}
+
+# Per-domain key finding for the completion summary: the one metrics column it
+# needs and how it is phrased (the column arrives as a numpy array)
+DOMAIN_FINDINGS = {
+    'service_deserts': ('is_service_desert', lambda col: f"{np.count_nonzero(col)} service deserts identified"),
+    'demand_behavior': ('dominant_service_type', lambda col: f"Dominant: {pd.Series(col).value_counts().index[0]}"),
+    'service_quality': ('consistency_tier', lambda col: f"{np.count_nonzero(col == 'high_consistency')} high consistency pincodes"),
+    'capacity_mismatch': ('mismatch_type', lambda col: f"{np.count_nonzero(col == 'low_activity')} low activity pincodes"),
+    'temporal': ('sufficient_coverage', lambda col: f"{np.count_nonzero(col)} pincodes with ≥6 months data"),
+}
+# Extra columns read for the population coverage check
+POPULATION_CHECK_COLUMNS = {'service_deserts': ['population']}
+
+# On Linux, launch children through posix_spawn instead of forking this
+# process (pandas, pyarrow and the log threads included). CPython only takes
+# that path without close_fds and cwd, which is safe here: the parent's own
+# descriptors are non-inheritable and the scripts use absolute paths
+SPAWN_OPTIONS = (
+    {'close_fds': False, 'restore_signals': False} if sys.platform.startswith('linux')
+    else {'cwd': str(BASE_DIR)}
+)
+
+# Scripts currently running in a worker thread, so a failure elsewhere in
+# the pool can kill them instead of waiting for them to finish
+RUNNING_SCRIPTS = set()
+RUNNING_LOCK = threading.Lock()
+STOPPING = threading.Event()
+
+def stop_running_scripts():
+    """Kill every running script and refuse to start new ones."""
+    with RUNNING_LOCK:
+        STOPPING.set()
+        for proc in RUNNING_SCRIPTS:
+            proc.kill()
+
+def stream_script(cmd, timeout, prefix=""):
+    """
+    Run a script command, forwarding each stdout/stderr line to the log as it arrives.
     
-    if not script_path.exists():
-        logger.error(f"Script not found: {script_path}")
-        return False
+    Lines are tagged with `prefix` so parallel scripts stay distinguishable.
+    Returns (returncode, timed_out); the child is killed after `timeout` seconds.
+    """
+    with RUNNING_LOCK:
+        if STOPPING.is_set():
+            raise RuntimeError("pipeline is stopping after a failure")
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            env={**os.environ, 'PYTHONUNBUFFERED': '1'},  # child prints reach us line by line
+            **SPAWN_OPTIONS
+        )
+        RUNNING_SCRIPTS.add(proc)
+    timed_out = threading.Event()
+    
+    def kill():
+        timed_out.set()
+        proc.kill()
+    
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    info = logger.info  # bound once for the per-line loop
+    try:
+        for line in proc.stdout:
+            info(f"{prefix}{line.rstrip()}")
+        proc.wait()
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+        with RUNNING_LOCK:
+            RUNNING_SCRIPTS.discard(proc)
+    
+    return proc.returncode, timed_out.is_set()
+
+def execute_script(script_name):
+    """
+    Run a single script, streaming its output to the log as "[script] line".
     
+    Returns (script_name, returncode, error); error is set (and returncode is
+    None) when the script could not be run to completion. A missing script
+    is reported by the interpreter itself ("can't open file", return code 2).
+    Safe to call from worker threads - report_script logs the outcome.
+    """
     logger.info("=" * 80)
     logger.info(f"RUNNING: {script_name}")
     logger.info("=" * 80)
     
     try:
-        result = subprocess.run(
-            [sys.executable, str(script_path)],
-            cwd=str(BASE_DIR),
-            capture_output=True,
-            text=True,
-            timeout=600  # 10 minute timeout per script
-        )
-        
-        if result.stdout:
-            logger.info(result.stdout)
+        returncode, timed_out = stream_script(SCRIPT_COMMANDS[script_name], timeout=600, prefix=f"[{script_name}] ")  # 10 minute timeout per script
+        if timed_out:
+            return script_name, None, f"Script {script_name} timed out after 10 minutes"
+        return script_name, returncode, None
         
-        if result.returncode != 0:
-            logger.error(f"Script {script_name} failed with return code {result.returncode}")
-            if result.stderr:
-                logger.error(f"STDERR:\n{result.stderr}")
-            return False
-        
-        logger.info(f"✓ {script_name} completed successfully")
-        return True
-        
-    except subprocess.TimeoutExpired:
-        logger.error(f"Script {script_name} timed out after 10 minutes")
-        return False
     except Exception as e:
-        logger.error(f"Error running {script_name}: {e}")
+        return script_name, None, f"Error running {script_name}: {e}"
+
+def report_script(result):
+    """Log the outcome of an executed script; returns True on success."""
+    script_name, returncode, error = result
+    
+    if error:
+        logger.error(error)
+        return False
+    
+    # stderr (e.g. a traceback) was streamed with the rest of the output
+    if returncode != 0:
+        logger.error(f"Script {script_name} failed with return code {returncode}")
         return False
+    
+    logger.info(f"✓ {script_name} completed successfully")
+    return True
+
+def run_script(script_name):
+    """Run a single script and check for errors."""
+    return report_script(execute_script(script_name))
+
+def pipeline_failed(script):
+    """Log the pipeline failure banner and exit."""
+    logger.error("")
+    logger.error("*" * 80)
+    logger.error("PIPELINE FAILED")
+    logger.error("*" * 80)
+    logger.error(f"Failed at script: {script}")
+    logger.error(f"Check {LOG_FILE} for details")
+    sys.exit(1)
+
+def read_validation(vfile):
+    """Read one domain's validation CSV as an Arrow table, tagged with its domain name."""
+    vdata = pv.read_csv(vfile, convert_options=pv.ConvertOptions(strings_can_be_null=True))
+    return vdata.append_column('domain', pa.array([vfile.parent.name] * vdata.num_rows, pa.string()))
 
 def aggregate_validation():
     """Aggregate validation results from all domains."""
@@ -90,24 +244,32 @@ def aggregate_validation():
     domains_dir = BASE_DIR / "outputs" / "domains"
     validation_files = list(domains_dir.glob("*/validation_*.csv"))
     
+    # The C parser releases the GIL, so the reads overlap; map keeps file order
     all_validations = []
-    for vfile in validation_files:
-        domain = vfile.parent.name
-        vdata = pd.read_csv(vfile)
-        vdata['domain'] = domain
-        all_validations.append(vdata)
+    if validation_files:
+        with ThreadPoolExecutor(max_workers=min(8, len(validation_files))) as executor:
+            all_validations = list(executor.map(read_validation, validation_files))
     
     if all_validations:
-        combined = pd.concat(all_validations, ignore_index=True)
+        # Arrow concatenation only chains the per-file chunks; the data is
+        # copied once, into pandas
+        combined = pa.concat_tables(all_validations, promote_options='default').to_pandas(
+            split_blocks=True, self_destruct=True
+        )
         
         logger.info(f"\nValidation Summary ({len(validation_files)} domains):")
         logger.info(combined.groupby('result')['check_name'].count().to_string())
         
         failures = combined[combined['result'] == 'FAIL']
         if len(failures) > 0:
-            logger.warning(f"\n{len(failures)} validation failures detected:")
-            for _, row in failures.iterrows():
-                logger.warning(f"  [{row['domain']}] {row['check_name']}: {row['details']}")
+            # One record for the whole list rather than one per failure
+            details = "\n".join(
+                f"  [{domain}] {check}: {detail}"
+                for domain, check, detail in zip(
+                    failures['domain'].to_numpy(), failures['check_name'].to_numpy(), failures['details'].to_numpy()
+                )
+            )
+            logger.warning("\n%d validation failures detected:\n%s", len(failures), details)
         else:
             logger.info("\n✓ All validation checks passed")
         
@@ -125,33 +287,29 @@ def generate_summary():
     domains_dir = BASE_DIR / "outputs" / "domains"
     
     summary = []
-    for domain_dir in sorted(domains_dir.glob("*")):
-        if domain_dir.is_dir():
-            domain = domain_dir.name
-            metrics_file = domain_dir / f"{domain}_metrics.csv"
-            summary_file = domain_dir / f"{domain}_summary.csv"
+    metrics = {}  # domain -> loaded metrics, reused by the population check below
+    # One scandir pass per directory; DirEntry type checks reuse the listing
+    # instead of a stat() per candidate path
+    for entry in sorted(os.scandir(domains_dir), key=lambda e: e.name):
+        if entry.is_dir():
+            domain = entry.name
+            with os.scandir(entry.path) as inner:
+                files = {f.name: Path(f.path) for f in inner if f.is_file()}
+            metrics_file = files.get(f"{domain}_metrics.csv")
             
-            if metrics_file.exists():
-                df = pd.read_csv(metrics_file)
+            if metrics_file is not None:
+                # Parse only the columns the summary uses (multithreaded pyarrow
+                # parser, as snapshot_cache uses); the header says which exist
+                finding_col, finding = DOMAIN_FINDINGS.get(domain, (None, None))
+                header = pd.read_csv(metrics_file, nrows=0).columns
+                usecols = [c for c in [finding_col] + POPULATION_CHECK_COLUMNS.get(domain, []) if c in header]
+                df = metrics[domain] = pd.read_csv(metrics_file, engine='pyarrow', usecols=usecols or header[:1].tolist())
                 row_count = len(df)
                 
                 # Top 5 outputs (domain-specific)
                 top5_desc = "N/A"
-                if domain == "service_deserts" and 'is_service_desert' in df.columns:
-                    desert_count = df['is_service_desert'].sum()
-                    top5_desc = f"{desert_count} service deserts identified"
-                elif domain == "demand_behavior" and 'dominant_service_type' in df.columns:
-                    top_type = df['dominant_service_type'].value_counts().index[0]
-                    top5_desc = f"Dominant: {top_type}"
-                elif domain == "service_quality" and 'consistency_tier' in df.columns:
-                    high = (df['consistency_tier'] == 'high_consistency').sum()
-                    top5_desc = f"{high} high consistency pincodes"
-                elif domain == "capacity_mismatch" and 'mismatch_type' in df.columns:
-                    low = (df['mismatch_type'] == 'low_activity').sum()
-                    top5_desc = f"{low} low activity pincodes"
-                elif domain == "temporal" and 'sufficient_coverage' in df.columns:
-                    sufficient = df['sufficient_coverage'].sum()
-                    top5_desc = f"{sufficient} pincodes with ≥6 months data"
+                if finding_col in df.columns:
+                    top5_desc = finding(df[finding_col].to_numpy())
                 
                 summary.append({
                     'domain': domain,
@@ -168,10 +326,9 @@ def generate_summary():
         logger.info("POPULATION COVERAGE CHECK")
         logger.info("=" * 80)
         
-        metrics_file = domains_dir / "service_deserts" / "service_deserts_metrics.csv"
-        if metrics_file.exists():
-            df = pd.read_csv(metrics_file)
-            pop_issues = (df['population'] <= 0).sum()
+        if 'service_deserts' in metrics:
+            df = metrics['service_deserts']
+            pop_issues = np.count_nonzero(df['population'].to_numpy() <= 0)
             logger.info(f"Pincodes with missing/zero population: {pop_issues}")
             if pop_issues == 0:
                 logger.info("✓ No population failures after imputation")
@@ -183,7 +340,16 @@ def generate_summary():
         logger.warning("No domain metrics found")
         return None
 
+def script_fingerprint(script_name):
+    """Fingerprint of a domain script's source and inputs (see pipeline_state)."""
+    return input_fingerprint(SCRIPTS_DIR / script_name, SCRIPT_FILES[script_name][0])
+
 def main():
+    parser = argparse.ArgumentParser(description="Run the domain analysis scripts (09-13, policy simulator).")
+    parser.add_argument('--force', action='store_true',
+                        help="rerun every script, ignoring pipeline_state.json")
+    args = parser.parse_args()
+    
     start_time = datetime.now()
     
     logger.info("*" * 80)
@@ -194,20 +360,57 @@ def main():
     logger.info(f"Number of scripts: {len(DOMAIN_SCRIPTS)}")
     logger.info("")
     
-    # Run all scripts
-    for i, script in enumerate(DOMAIN_SCRIPTS, 1):
+    # Convert the cleaned snapshots to their shared Parquet cache once, up front
+    if not run_script("snapshot_cache.py"):
+        logger.error("Snapshot conversion failed")
+        sys.exit(1)
+    
+    # Skip the independent scripts that are already up to date
+    state = load_state(STATE_FILE)
+    fingerprints = {script: script_fingerprint(script) for script in INDEPENDENT_SCRIPTS}
+    pending = []
+    for script in INDEPENDENT_SCRIPTS:
+        if not args.force and is_up_to_date(state, script, fingerprints[script]):
+            logger.info(f"✓ {script} cached, skipping")
+        else:
+            pending.append(script)
+    
+    # Run the rest in parallel. Each worker thread only streams its
+    # subprocess's output (lines tagged by script); outcomes are checked
+    # here as they complete
+    if pending:
+        max_workers = min(len(pending), os.cpu_count() or 1)
+        logger.info(f"\nSteps 1-{len(INDEPENDENT_SCRIPTS)}/{len(DOMAIN_SCRIPTS)}: {', '.join(pending)} ({max_workers} workers)")
+        
+        failed = None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(execute_script, script) for script in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                if not report_script(result):
+                    # Cancel the queued scripts and kill the running ones, so
+                    # leaving the pool does not wait on results we discard
+                    failed = result[0]
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    stop_running_scripts()
+                    break
+                script = result[0]
+                record_success(STATE_FILE, state, script, fingerprints[script], SCRIPT_FILES[script][1])
+        if failed:
+            pipeline_failed(failed)
+    
+    # Then the scripts that consume their outputs, in order
+    for i, script in enumerate(FINAL_SCRIPTS, len(INDEPENDENT_SCRIPTS) + 1):
         logger.info(f"\nStep {i}/{len(DOMAIN_SCRIPTS)}: {script}")
         
-        success = run_script(script)
+        fingerprint = script_fingerprint(script)
+        if not args.force and is_up_to_date(state, script, fingerprint):
+            logger.info(f"✓ {script} cached, skipping")
+            continue
         
-        if not success:
-            logger.error("")
-            logger.error("*" * 80)
-            logger.error("PIPELINE FAILED")
-            logger.error("*" * 80)
-            logger.error(f"Failed at script: {script}")
-            logger.error(f"Check {LOG_FILE} for details")
-            sys.exit(1)
+        if not run_script(script):
+            pipeline_failed(script)
+        record_success(STATE_FILE, state, script, fingerprint, SCRIPT_FILES[script][1])
     
     # Aggregate validation
     validate = aggregate_validation()
@@ -0,0 +1,146 @@
+"""
+Parquet cache of the cleaned snapshot shared by the domain scripts (09-13).
+
+The first caller parses cleaned_uidai_snapshot_*.csv once and writes every
+column to cache/<snapshot name>.parquet: zstd-compressed, with district,
+state and urban_flag dictionary-encoded and row-group statistics. Later
+callers memory-map the Parquet file and decode only the columns they use.
+The cache is rebuilt whenever the snapshot CSV, or this module (which
+defines the conversion), is newer.
+
+Run directly (run_all_domains does this first) to convert every cleaned
+snapshot up front, so the domain scripts never re-parse the CSV.
+"""
+
+import pandas as pd
+import pyarrow.parquet as pq
+from pathlib import Path
+import logging
+import os
+import sys
+import io
+
+from _common import newer_than
+
+BASE_DIR = Path(r"C:\Users\Lalit Hire\UIDAI Data Hackathon 2026\data")
+SNAPSHOT_DIR = BASE_DIR / "outputs" / "data_snapshots"
+SNAPSHOT_POINTER = SNAPSHOT_DIR / "latest.txt"  # written by the notebook next to each new cleaned snapshot
+CACHE_DIR = BASE_DIR / "cache"
+LOG_FILE = BASE_DIR / "outputs" / "antigravity" / "antigravity.log"
+
+DICTIONARY_COLUMNS = ['district', 'state', 'urban_flag']
+ROW_GROUP_SIZE = 128_000
+
+logger = logging.getLogger(__name__)
+
+def latest_snapshot():
+    """
+    Path of the newest cleaned snapshot (newest cleaned_uidai_snapshot_*.csv by mtime).
+    
+    The one-line SNAPSHOT_POINTER is followed when it names an existing file
+    at least as new as every snapshot; a newer snapshot written outside the
+    notebook wins over a stale pointer, with a warning.
+    """
+    snapshot_files = list(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
+    newest = max(snapshot_files, key=lambda x: x.stat().st_mtime) if snapshot_files else None
+    
+    if SNAPSHOT_POINTER.exists():
+        snapshot_file = SNAPSHOT_DIR / SNAPSHOT_POINTER.read_text().strip()
+        if snapshot_file.is_file():
+            if newest is None or snapshot_file.stat().st_mtime >= newest.stat().st_mtime:
+                return snapshot_file
+            logger.warning(f"{SNAPSHOT_POINTER.name} names {snapshot_file.name}, but {newest.name} is newer; using {newest.name}")
+    
+    if newest is None:
+        raise FileNotFoundError("No cleaned snapshot found")
+    
+    return newest
+
+def snapshot_cache_path(snapshot_csv, cache_dir=CACHE_DIR):
+    """cache/<snapshot stem>.parquet for a cleaned snapshot CSV."""
+    return Path(cache_dir) / Path(snapshot_csv).with_suffix('.parquet').name
+
+def build_snapshot_cache(snapshot_csv, cache_path):
+    """Parse the snapshot CSV once (all columns) and write it as Parquet."""
+    logger.info(f"Caching snapshot {Path(snapshot_csv).name} as Parquet")
+    
+    # Same parser (and null handling) as the scripts' own pd.read_csv calls
+    df = pd.read_csv(snapshot_csv, engine='pyarrow')
+    
+    # Write via a per-process temp file so neither a concurrent reader nor a
+    # concurrent builder ever sees a partial cache
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f'.parquet.{os.getpid()}.tmp')
+    df.to_parquet(
+        tmp_path, engine='pyarrow', index=False, compression='zstd',
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in df.columns],
+        row_group_size=ROW_GROUP_SIZE
+    )
+    tmp_path.replace(cache_path)
+    logger.info(f"Cached snapshot to {cache_path}")
+
+def cached_snapshot(snapshot_csv, cache_dir=CACHE_DIR):
+    """Path of the snapshot's Parquet cache, (re)building it when missing or stale."""
+    snapshot_csv = Path(snapshot_csv)
+    cache_path = snapshot_cache_path(snapshot_csv, cache_dir)
+    
+    if not newer_than(cache_path, [snapshot_csv, Path(__file__)]):
+        build_snapshot_cache(snapshot_csv, cache_path)
+    
+    return cache_path
+
+def snapshot_columns(snapshot_csv):
+    """Column names of the snapshot, read from the cache's Parquet schema."""
+    return pq.read_schema(cached_snapshot(snapshot_csv)).names
+
+def load_snapshot(snapshot_csv, columns=None, dtype=None):
+    """
+    Return the snapshot as a numpy-backed DataFrame, read from the Parquet cache.
+    
+    Only `columns` are decoded (all when None); `dtype` is passed to astype.
+    """
+    table = pq.read_table(cached_snapshot(snapshot_csv), columns=columns, memory_map=True)
+    df = table.to_pandas()
+    return df.astype(dtype) if dtype else df
+
+def iter_snapshot(snapshot_csv, columns=None, dtype=None):
+    """Like load_snapshot, but yield one DataFrame per Parquet row group."""
+    parquet_file = pq.ParquetFile(cached_snapshot(snapshot_csv), memory_map=True)
+    for i in range(parquet_file.num_row_groups):
+        df = parquet_file.read_row_group(i, columns=columns).to_pandas()
+        yield df.astype(dtype) if dtype else df
+
+def aggregate_pincodes(df, sort=True):
+    """
+    Collapse rows to one per pincode (first district/state/urban_flag, summed counts).
+    
+    Applied to each iter_snapshot row group and again to the concatenated
+    partials, which is exact because first and sum both recombine.
+    """
+    return df.groupby('pincode', as_index=False, sort=sort).agg(
+        district=('district', 'first'),
+        state=('state', 'first'),
+        population=('population', 'sum'),
+        urban_flag=('urban_flag', 'first'),
+        total_activity=('total_activity', 'sum')
+    )
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE, encoding='utf-8'),
+            logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True))
+        ]
+    )
+    
+    snapshot_files = sorted(SNAPSHOT_DIR.glob("cleaned_uidai_snapshot_*.csv"))
+    if not snapshot_files:
+        raise FileNotFoundError("No cleaned snapshot found")
+    
+    for snapshot_file in snapshot_files:
+        logger.info(f"Snapshot cache ready: {cached_snapshot(snapshot_file)}")
+
+if __name__ == "__main__":
+    main()